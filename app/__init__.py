@@ -1,33 +1,37 @@
 from flask import Flask
 from config import Config
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from flask_moment import Moment
 from flask_login import LoginManager
 import os
 from logging.handlers import RotatingFileHandler
 import logging
 from flaskext.markdown import Markdown
 from flask_mail import Mail
+from werkzeug.middleware.proxy_fix import ProxyFix
+from app.replicas import RoutingSQLAlchemy, replicas
 
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
 migrate = Migrate()
 login = LoginManager()
 login.login_view = "auth.login"
 login.login_message = "Faz login ou regista-te!"
 mail = Mail()
-moment = Moment()
 
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    if app.config["PROXY_FIX_X_FOR"]:
+        # remote_addr is the client's, not nginx's, for the rate limits
+        app.wsgi_app = ProxyFix(
+            app.wsgi_app, x_for=app.config["PROXY_FIX_X_FOR"]
+        )
 
     db.init_app(app)
+    replicas.init_app(app)
     migrate.init_app(app, db)
     login.init_app(app)
     mail.init_app(app)
-    moment.init_app(app)
     markdown = Markdown(app)
 
     from app.errors import bp as errors_bp
@@ -42,11 +46,60 @@ def create_app(config_class=Config):
 
     app.register_blueprint(main_bp)
 
+    from app.api import bp as api_bp
+
+    app.register_blueprint(api_bp, url_prefix="/api/v1")
+
+    from app.sqlite import sqlite_profile
+
+    sqlite_profile.init_app(app)
+
+    from app.instrumentation import instrumentation
+
+    instrumentation.init_app(app)
+
+    from app.ratelimit import limiter
+
+    limiter.init_app(app)
+
+    from app.cache import cache
+
+    cache.init_app(app)
+
+    from app.identity import identity
+
+    identity.init_app(app)
+
+    from app.search import search_index
+
+    search_index.init_app(app)
+
+    from app.jobs import queue
+
+    queue.init_app(app)
+
+    from app.ranking import scheduler
+
+    scheduler.init_app(app)
+
+    from app.votes import votes
+
+    votes.init_app(app)
+
+    from app.assets import assets
+
+    assets.init_app(app)
+
+    from app import cli, timeago
+
+    cli.register(app)
+    timeago.register(app)
+
     if not app.debug:
         if not os.path.exists("logs"):
             os.mkdir("logs")
         file_handler = RotatingFileHandler(
-            "logs/devpt.log", maxBytes=10240, backupCount=10
+            "logs/devpt.log", maxBytes=1024 * 1024, backupCount=10
         )
         file_handler.setFormatter(
             logging.Formatter(
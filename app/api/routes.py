@@ -0,0 +1,235 @@
+import gzip
+import hashlib
+import json
+import re
+
+from flask import Response, abort, current_app, request, url_for
+
+from app import db
+from app.api import bp
+from app.api.errors import bad_request
+from app.models import Comment, Post, User
+from app.pagination import KeysetPage, decode_cursor, keyset_paginate
+from app.ranking import front_page
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def isoformat(timestamp):
+    return timestamp.isoformat() + "Z" if timestamp else None
+
+
+POST_FIELDS = {
+    "id": lambda post: post.id,
+    "title": lambda post: post.title,
+    "url": lambda post: post.url,
+    "source": lambda post: post.url_base,
+    "text": lambda post: post.text,
+    "score": lambda post: post.score,
+    "comments": lambda post: post.total_comments(),
+    "author": lambda post: post.author.username if post.author else None,
+    "timestamp": lambda post: isoformat(post.timestamp),
+}
+
+COMMENT_FIELDS = {
+    "id": lambda comment: comment.id,
+    "post_id": lambda comment: comment.post_id,
+    "parent_id": lambda comment: comment.parent_id,
+    "level": lambda comment: comment.level(),
+    "text": lambda comment: comment.text,
+    "score": lambda comment: comment.score,
+    "author": lambda comment: (
+        comment.author.username if comment.author else None
+    ),
+    "timestamp": lambda comment: isoformat(comment.timestamp),
+}
+
+USER_FIELDS = {
+    "username": lambda user: user.username,
+    "about_me": lambda user: user.about_me,
+    "karma": lambda user: user.karma,
+    "created": lambda user: isoformat(user.timestamp),
+}
+
+COMMENT_PATH = re.compile(r"^\d+(\.\d+)*$")
+
+
+def fields_arg(available):
+    fields = request.args.get("fields")
+    if not fields:
+        return list(available)
+    fields = fields.split(",")
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        abort(bad_request("Unknown fields: " + ", ".join(unknown)))
+    return fields
+
+
+def limit_arg():
+    limit = request.args.get("limit", current_app.config["API_PAGE_SIZE"], int)
+    return max(1, min(limit, current_app.config["API_MAX_PAGE_SIZE"]))
+
+
+def serialize(item, available, fields):
+    return {field: available[field](item) for field in fields}
+
+
+def accepted_encoding(size):
+    if size < current_app.config["API_COMPRESS_MIN_SIZE"]:
+        return None
+    if brotli is not None and "br" in request.accept_encodings:
+        return "br"
+    if "gzip" in request.accept_encodings:
+        return "gzip"
+    return None
+
+
+def api_response(payload):
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    if len(body) > current_app.config["API_RESPONSE_BUDGET"]:
+        current_app.logger.warning(
+            f"API response over budget: {request.full_path} {len(body)} bytes"
+        )
+
+    # the tag covers the exact payload, so an edit or a vote anywhere in
+    # the page changes it; each encoding is its own representation and
+    # gets its own strong tag
+    encoding = accepted_encoding(len(body))
+    etag = hashlib.sha1(body).hexdigest()
+    if encoding:
+        etag += "-" + encoding
+
+    response = Response(mimetype="application/json")
+    response.set_etag(etag)
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config["API_CACHE_MAX_AGE"]
+    if request.if_none_match.contains(etag):
+        response.status_code = 304
+        return response
+
+    if encoding == "br":
+        body = brotli.compress(body)
+    elif encoding == "gzip":
+        body = gzip.compress(body, 6)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.set_data(body)
+    return response
+
+
+def page_response(page, endpoint, available, fields, **values):
+    next_url = None
+    if request.args.get("fields"):
+        values["fields"] = request.args["fields"]
+    if "limit" in request.args:
+        values["limit"] = limit_arg()
+    if page.has_next:
+        next_url = url_for(
+            endpoint, after=page.next_cursor, _external=True, **values
+        )
+    return api_response(
+        {
+            "items": [
+                serialize(item, available, fields) for item in page.items
+            ],
+            "next": next_url,
+        }
+    )
+
+
+def keyset_page(query, model):
+    after = request.args.get("after")
+    cursor = None
+    if after is not None:
+        cursor = decode_cursor(after)
+        if cursor is None:
+            abort(bad_request("Invalid cursor"))
+    return keyset_paginate(query, model, cursor, limit_arg())
+
+
+@bp.route("/posts", methods=["GET"])
+def get_posts():
+    fields = fields_arg(POST_FIELDS)
+    sort = request.args.get("sort", "hot")
+    if sort == "hot":
+        page = KeysetPage(front_page().limit(limit_arg()).all(), None, 1)
+    elif sort == "new":
+        page = keyset_page(
+            Post.query.filter_by(deleted=0).options(
+                db.joinedload(Post.author)
+            ),
+            Post,
+        )
+    else:
+        abort(bad_request("sort must be hot or new"))
+    return page_response(page, "api.get_posts", POST_FIELDS, fields, sort=sort)
+
+
+@bp.route("/posts/<int:id>", methods=["GET"])
+def get_post(id):
+    fields = fields_arg(POST_FIELDS)
+    post = (
+        Post.query.filter_by(id=id, deleted=0)
+        .options(db.joinedload(Post.author))
+        .first_or_404()
+    )
+    return api_response(serialize(post, POST_FIELDS, fields))
+
+
+@bp.route("/posts/<int:id>/comments", methods=["GET"])
+def get_post_comments(id):
+    fields = fields_arg(COMMENT_FIELDS)
+    Post.query.filter_by(id=id, deleted=0).with_entities(
+        Post.id
+    ).first_or_404()
+
+    # thread order: walking the materialised path puts every reply right
+    # after its parent, and the last path seen is the cursor
+    query = Comment.query.filter_by(post_id=id).options(
+        db.joinedload(Comment.author)
+    )
+    after = request.args.get("after")
+    if after is not None:
+        if not COMMENT_PATH.match(after):
+            abort(bad_request("Invalid cursor"))
+        query = query.filter(Comment.path > after)
+    limit = limit_arg()
+    comments = query.order_by(Comment.path.asc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(comments) > limit:
+        comments = comments[:limit]
+        next_cursor = comments[-1].path
+    return page_response(
+        KeysetPage(comments, next_cursor, 1),
+        "api.get_post_comments",
+        COMMENT_FIELDS,
+        fields,
+        id=id,
+    )
+
+
+@bp.route("/users/<username>", methods=["GET"])
+def get_user(username):
+    fields = fields_arg(USER_FIELDS)
+    user = User.query.filter_by(username=username).first_or_404()
+    return api_response(serialize(user, USER_FIELDS, fields))
+
+
+@bp.route("/users/<username>/posts", methods=["GET"])
+def get_user_posts(username):
+    fields = fields_arg(POST_FIELDS)
+    user = User.query.filter_by(username=username).first_or_404()
+    page = keyset_page(
+        Post.query.filter_by(user_id=user.id, deleted=0).options(
+            db.joinedload(Post.author)
+        ),
+        Post,
+    )
+    return page_response(
+        page, "api.get_user_posts", POST_FIELDS, fields, username=username
+    )
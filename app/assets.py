@@ -0,0 +1,157 @@
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+from flask import current_app, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DIST = "dist"
+MANIFEST = "manifest.json"
+# images are compressed already
+COMPRESSIBLE = {".css", ".js", ".svg", ".ico", ".json", ".txt"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+CSS_SPACE = re.compile(r"\s+")
+CSS_PUNCTUATION = re.compile(r"\s*([{};,>])\s*")
+CSS_COLON = re.compile(r":\s+")
+CSS_URL = re.compile(r"""url\(\s*(["']?)([^"')]+)\1\s*\)""")
+
+
+class Assets(object):
+    # fingerprinted copies of app/static, built by "flask assets build"
+    # into static/dist with a manifest from original to hashed names.
+    # Without a build, or in debug mode, asset_url falls back to the plain
+    # static files
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        manifest = {}
+        path = os.path.join(app.static_folder, DIST, MANIFEST)
+        if not app.debug and os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+        app.extensions["assets"] = manifest
+        app.add_url_rule("/assets/<path:filename>", "asset", serve_asset)
+        app.jinja_env.globals["asset_url"] = asset_url
+
+
+def minify_css(css):
+    css = CSS_COMMENT.sub("", css)
+    css = CSS_SPACE.sub(" ", css)
+    css = CSS_PUNCTUATION.sub(r"\1", css)
+    css = CSS_COLON.sub(":", css)
+    return css.replace(";}", "}").strip()
+
+
+def rewrite_urls(css, name, manifest):
+    # references are relative to the stylesheet, and dist mirrors the
+    # layout of static, so they keep working once renamed
+    directory = os.path.dirname(name)
+
+    def hashed(match):
+        target = os.path.normpath(os.path.join(directory, match.group(2)))
+        if target not in manifest:
+            return match.group(0)
+        return f'url("{os.path.relpath(manifest[target], directory or ".")}")'
+
+    return CSS_URL.sub(hashed, css)
+
+
+def compress(content):
+    buffer = io.BytesIO()
+    # a fixed mtime keeps the output identical between builds
+    with gzip.GzipFile(fileobj=buffer, mode="wb", mtime=0) as f:
+        f.write(content)
+    return buffer.getvalue()
+
+
+def build(app):
+    static = app.static_folder
+    dist = os.path.join(static, DIST)
+    shutil.rmtree(dist, ignore_errors=True)
+
+    names = []
+    for directory, subdirectories, files in os.walk(static):
+        if directory == static:
+            subdirectories[:] = [d for d in subdirectories if d != DIST]
+        names.extend(
+            os.path.relpath(os.path.join(directory, name), static)
+            for name in files
+        )
+    # stylesheets last, so what they reference already has its new name
+    names.sort(key=lambda name: (name.endswith(".css"), name))
+
+    manifest = {}
+    for name in names:
+        with open(os.path.join(static, name), "rb") as f:
+            content = f.read()
+        root, extension = os.path.splitext(name)
+        if extension == ".css":
+            css = rewrite_urls(content.decode("utf-8"), name, manifest)
+            content = minify_css(css).encode("utf-8")
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        manifest[name] = hashed = f"{root}.{digest}{extension}"
+
+        variants = {"": content}
+        if extension in COMPRESSIBLE:
+            variants[".gz"] = compress(content)
+            if brotli is not None:
+                variants[".br"] = brotli.compress(content)
+        path = os.path.join(dist, hashed)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for suffix, data in variants.items():
+            if suffix and len(data) >= len(content):
+                continue
+            with open(path + suffix, "wb") as f:
+                f.write(data)
+
+    with open(os.path.join(dist, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    app.extensions["assets"] = manifest
+    return manifest
+
+
+def asset_url(filename):
+    hashed = current_app.extensions["assets"].get(filename)
+    if hashed is None:
+        return url_for("static", filename=filename)
+    return url_for("asset", filename=hashed)
+
+
+def serve_asset(filename):
+    # hashed names never change content, so clients keep them for a year;
+    # precompressed variants are picked by Accept-Encoding
+    dist = os.path.join(current_app.static_folder, DIST)
+    served, encoding = filename, None
+    for name, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[name] and os.path.isfile(
+            os.path.join(dist, filename + suffix)
+        ):
+            served, encoding = filename + suffix, name
+            break
+    response = send_from_directory(
+        dist,
+        served,
+        mimetype=mimetypes.guess_type(filename)[0]
+        or "application/octet-stream",
+    )
+    response.headers["Cache-Control"] = IMMUTABLE
+    response.vary.add("Accept-Encoding")
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+assets = Assets()
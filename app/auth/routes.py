@@ -1,16 +1,25 @@
-from flask import flash, redirect, render_template, request, url_for
+from flask import (
+    current_app,
+    flash,
+    redirect,
+    render_template,
+    request,
+    url_for,
+)
 from flask_login import current_user, login_user, logout_user
 from werkzeug.urls import url_parse
 
 from app import db
 from app.auth import bp
+from app.identity import identity
 from app.auth.forms import (
     LoginForm,
     RegistrationForm,
     ResetPasswordRequestForm,
     ResetPasswordForm,
 )
-from app.models import User
+from app.models import DAY, User
+from app.ratelimit import limiter
 from app.auth.email import send_password_reset_email
 
 
@@ -44,6 +53,14 @@ def register():
         return redirect(url_for("main.index"))
     form = RegistrationForm()
     if form.validate_on_submit():
+        if not limiter.hit(
+            "register",
+            request.remote_addr,
+            current_app.config["REGISTRATIONS_PER_DAY"],
+            DAY,
+        ):
+            flash("Demasiados registos. Tenta outra vez amanhã.")
+            return redirect(url_for("auth.register"))
         user = User(username=form.username.data, email=form.email.data)
         user.set_password(form.password.data)
         db.session.add(user)
@@ -80,6 +97,7 @@ def reset_password(token):
     if form.validate_on_submit():
         user.set_password(form.password.data)
         db.session.commit()
+        identity.invalidate(user.id)
         flash("A tua password foi reposta.")
         return redirect(url_for("auth.login"))
     return render_template("auth/reset_password.html", form=form)
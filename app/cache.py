@@ -0,0 +1,178 @@
+from collections import OrderedDict
+from threading import Lock
+import pickle
+import re
+import time
+
+from flask import Markup, current_app, render_template
+from flask_login import current_user
+
+from app.replicas import pinned_to_primary, reads_from_replica, replicas
+
+
+class LRUCache(object):
+    def __init__(self, max_entries=500, default_timeout=30):
+        self.entries = OrderedDict()
+        self.counters = {}
+        self.lock = Lock()
+        self.max_entries = max_entries
+        self.default_timeout = default_timeout
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires = time.time() + (timeout or self.default_timeout)
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def counter(self, key):
+        return self.counters.get(key, 0)
+
+    def incr(self, key):
+        # counters live outside the LRU so they can never be evicted
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+            return self.counters[key]
+
+
+class RedisCache(object):
+    # shared between workers, so an invalidation reaches all of them
+    def __init__(self, url, default_timeout=30):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.default_timeout = default_timeout
+
+    def get(self, key):
+        value = self.client.get(key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, timeout=None):
+        self.client.set(
+            key, pickle.dumps(value), ex=timeout or self.default_timeout
+        )
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def counter(self, key):
+        return int(self.client.get(key) or 0)
+
+    def incr(self, key):
+        return self.client.incr(key)
+
+
+class NullCache(object):
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def counter(self, key):
+        return 0
+
+    def incr(self, key):
+        return 0
+
+
+CONTROLS = re.compile(r"<!--post-controls:(\d+):(\d*):([01])-->")
+
+
+class FragmentCache(object):
+    generation_key = "listings:generation"
+    settling_key = "listings:settling"
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cache_type = app.config["CACHE_TYPE"]
+        if cache_type == "redis":
+            backend = RedisCache(
+                app.config["CACHE_REDIS_URL"],
+                app.config["CACHE_DEFAULT_TIMEOUT"],
+            )
+        elif cache_type == "memory":
+            backend = LRUCache(
+                app.config["CACHE_MAX_ENTRIES"],
+                app.config["CACHE_DEFAULT_TIMEOUT"],
+            )
+        else:
+            backend = NullCache()
+        app.extensions["fragment_cache"] = backend
+
+    @property
+    def backend(self):
+        return current_app.extensions["fragment_cache"]
+
+    def invalidate(self):
+        # bumping the generation orphans every cached listing at once;
+        # the stale entries age out of the backend on their own
+        self.backend.incr(self.generation_key)
+        if replicas.binds(current_app):
+            # replicas may lag for as long as sessions stick to the primary
+            self.backend.set(
+                self.settling_key,
+                True,
+                current_app.config["DATABASE_STICKY_SECONDS"],
+            )
+
+    def listing(self, key, render):
+        # render() returns (html, next_url) for the anonymous version of a
+        # listing; per-user controls are filled in on every request. Users
+        # who just wrote skip the cache, which may hold a replica's older
+        # copy, and replica renders right after a write aren't kept
+        if key is None or pinned_to_primary():
+            html, next_url = render()
+        else:
+            generation = self.backend.counter(self.generation_key)
+            key = ":".join(["listings", str(generation)] + list(map(str, key)))
+            cached = self.backend.get(key)
+            if cached is None:
+                settling = self.backend.get(self.settling_key)
+                cached = render()
+                if not (settling and reads_from_replica()):
+                    self.backend.set(key, cached)
+            html, next_url = cached
+        return Markup(CONTROLS.sub(post_controls, html)), next_url
+
+
+def post_controls(match):
+    if not current_user.is_authenticated:
+        return ""
+    post_id, user_id, has_text = match.groups()
+    if str(current_user.id) != user_id and not current_user.is_admin():
+        return ""
+    return render_template(
+        "_post_controls.html",
+        post={
+            "id": int(post_id),
+            "user_id": int(user_id) if user_id else None,
+            "text": has_text == "1",
+        },
+    )
+
+
+cache = FragmentCache()
@@ -0,0 +1,99 @@
+import click
+
+
+def register(app):
+    @app.cli.group()
+    def rankings():
+        """Front page ranking commands."""
+        pass
+
+    @rankings.command()
+    def refresh():
+        """Recompute stale popularity scores."""
+        from app.ranking import refresh_rankings
+
+        click.echo(f"Re-ranked {refresh_rankings()} posts.")
+
+    @app.cli.group()
+    def markdown():
+        """Rendered markdown commands."""
+        pass
+
+    @markdown.command()
+    @click.option("--batch", default=1000, help="Rows rendered per batch.")
+    @click.option("--workers", default=None, type=int, help="Processes.")
+    def backfill(batch, workers):
+        """Render posts and comments that have no cached HTML yet."""
+        from app import db
+        from app.models import Comment, Post
+        from app.rendering import render_many
+
+        for model in (Post, Comment):
+            total = 0
+            while True:
+                rows = (
+                    db.session.query(model.id, model.text)
+                    .filter(model.text.isnot(None), model.text_html.is_(None))
+                    .order_by(model.id)
+                    .limit(batch)
+                    .all()
+                )
+                if not rows:
+                    break
+                rendered = render_many([text for _, text in rows], workers)
+                db.session.bulk_update_mappings(
+                    model,
+                    [
+                        {"id": id, "text_html": html}
+                        for (id, _), html in zip(rows, rendered)
+                    ],
+                )
+                db.session.commit()
+                total += len(rows)
+            click.echo(f"Rendered {total} {model.__tablename__} rows.")
+
+    @app.cli.group()
+    def jobs():
+        """Background job queue commands."""
+        pass
+
+    @jobs.command()
+    def run():
+        """Run every job that is due, then exit."""
+        from app.jobs import run_pending
+
+        click.echo(f"Ran {run_pending()} jobs.")
+
+    @jobs.command()
+    def work():
+        """Process jobs until interrupted."""
+        from app.jobs import queue
+
+        queue.work(app)
+
+    @app.cli.group()
+    def search():
+        """Search index commands."""
+        pass
+
+    @search.command()
+    @click.option("--batch", default=1000, help="Rows indexed per batch.")
+    def reindex(batch):
+        """Rebuild the search index from scratch."""
+        from app.search import search_index
+
+        for table, total in search_index.reindex(batch).items():
+            click.echo(f"Indexed {total} {table} rows.")
+
+    @app.cli.group()
+    def assets():
+        """Static asset commands."""
+        pass
+
+    @assets.command()
+    def build():
+        """Fingerprint, minify and precompress app/static into dist."""
+        from app.assets import build as build_assets
+
+        manifest = build_assets(app)
+        click.echo(f"Built {len(manifest)} assets.")
@@ -0,0 +1,76 @@
+from app.models import Comment
+from app.read_models import CommentRow
+
+
+class CommentNode(object):
+    __slots__ = ("comment", "children", "level", "depth", "size", "collapsed")
+
+    def __init__(self, comment):
+        self.comment = comment
+        self.children = []
+        self.level = 0
+        self.depth = 0
+        self.size = 1
+        self.collapsed = False
+
+    @property
+    def hidden(self):
+        return self.size - 1 if self.collapsed else 0
+
+
+class CommentTree(object):
+    def __init__(self, comments):
+        # comments ordered by path, so every parent comes before its
+        # replies and siblings come out oldest first
+        self.nodes = {}
+        self.roots = []
+        for comment in comments:
+            node = CommentNode(comment)
+            self.nodes[comment.id] = node
+            parent = self.nodes.get(comment.parent_id)
+            if parent is None:
+                self.roots.append(node)
+            else:
+                node.level = parent.level + 1
+                parent.children.append(node)
+        for comment in reversed(comments):
+            node = self.nodes[comment.id]
+            parent = self.nodes.get(comment.parent_id)
+            if parent is not None:
+                parent.size += node.size
+        self.roots.sort(key=lambda node: -(node.comment.thread_score or 0))
+
+    @classmethod
+    def for_post(cls, post_id):
+        return cls(
+            CommentRow.wrap(
+                CommentRow.query()
+                .filter(Comment.post_id == post_id)
+                .order_by(Comment.path.asc())
+            )
+        )
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def subtree(self, comment_id):
+        node = self.nodes.get(comment_id)
+        return [node] if node is not None else []
+
+    def flatten(self, roots, collapse=(), max_depth=None):
+        # depth first, in display order; collapsed nodes and anything
+        # deeper than max_depth keep their row but hide their replies
+        rows = []
+        base = roots[0].level if roots else 0
+        stack = list(reversed(roots))
+        while stack:
+            node = stack.pop()
+            node.depth = node.level - base
+            node.collapsed = bool(node.children) and (
+                node.comment.id in collapse
+                or (max_depth is not None and node.depth >= max_depth)
+            )
+            rows.append(node)
+            if not node.collapsed:
+                stack.extend(reversed(node.children))
+        return rows
@@ -1,18 +1,30 @@
-from threading import Thread
-from flask import current_app
 from flask_mail import Message
 from app import mail
+from app.jobs import enqueue, task
 
 
-def send_async_email(app, msg):
-    with app.app_context():
-        mail.send(msg)
+@task("send_email")
+def deliver_emails(payloads):
+    # one SMTP connection for the whole batch
+    errors = []
+    with mail.connect() as connection:
+        for payload in payloads:
+            try:
+                connection.send(Message(**payload))
+                errors.append(None)
+            except Exception as error:
+                errors.append(error)
+    return errors
 
 
 def send_email(subject, sender, recipients, text_body, html_body):
-    msg = Message(subject, sender=sender, recipients=recipients)
-    msg.body = text_body
-    msg.html = html_body
-    Thread(
-        target=send_async_email, args=(current_app._get_current_object(), msg)
-    ).start()
+    enqueue(
+        "send_email",
+        {
+            "subject": subject,
+            "sender": sender,
+            "recipients": recipients,
+            "body": text_body,
+            "html": html_body,
+        },
+    )
@@ -0,0 +1,59 @@
+from flask import current_app
+from sqlalchemy.orm import make_transient_to_detached
+
+from app import db, login
+from app.cache import LRUCache
+from app.models import User
+
+# everything a page view needs from current_user. The password hash stays
+# out, and so does karma: it moves with every vote on the user's posts, so
+# rather than invalidating on each one it is loaded on demand
+COLUMNS = [
+    column.key
+    for column in User.__table__.columns
+    if column.key not in ("password_hash", "karma")
+]
+
+
+class IdentityCache(object):
+    # per process: an edit made through one worker reaches the others when
+    # their snapshot times out
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["identity"] = LRUCache(
+            app.config["IDENTITY_CACHE_SIZE"],
+            app.config["IDENTITY_CACHE_TIMEOUT"],
+        )
+
+    @property
+    def snapshots(self):
+        return current_app.extensions["identity"]
+
+    def load(self, id):
+        snapshot = self.snapshots.get(id)
+        if snapshot is None:
+            user = User.query.get(id)
+            if user is not None:
+                self.snapshots.set(
+                    id, {key: getattr(user, key) for key in COLUMNS}
+                )
+            return user
+        # rebuilt as if just loaded, then attached without a SELECT
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    def invalidate(self, id):
+        if id is not None:
+            self.snapshots.delete(int(id))
+
+
+identity = IdentityCache()
+
+
+@login.user_loader
+def load_user(id):
+    return identity.load(int(id))
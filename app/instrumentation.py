@@ -0,0 +1,235 @@
+from threading import Lock
+import os
+import time
+import traceback
+
+from flask import (
+    Response,
+    before_render_template,
+    current_app,
+    g,
+    has_app_context,
+    request,
+    request_finished,
+    request_started,
+    template_rendered,
+)
+from sqlalchemy.engine import Engine
+
+from app import db
+
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class Metrics(object):
+    # per process: with several gunicorn workers, a scrape of /metrics gets
+    # the counters of whichever worker answers it, not their sum
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.lock = Lock()
+
+    def observe(self, name, endpoint, value, buckets=SECONDS):
+        with self.lock:
+            histogram = self.histograms.get((name, endpoint))
+            if histogram is None:
+                histogram = self.histograms[(name, endpoint)] = Histogram(
+                    buckets
+                )
+            histogram.observe(value)
+
+    def incr(self, name, endpoint):
+        with self.lock:
+            key = (name, endpoint)
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def render(self):
+        lines = [f"# counters of worker pid {os.getpid()} only"]
+        with self.lock:
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, endpoint), histogram in sorted(
+                    self.histograms.items()
+                ):
+                    if metric != name:
+                        continue
+                    label = f'endpoint="{endpoint}"'
+                    cumulative = 0
+                    for bound, count in zip(
+                        histogram.buckets, histogram.counts
+                    ):
+                        cumulative += count
+                        lines.append(
+                            f'{name}_bucket{{{label},le="{bound}"}} '
+                            f"{cumulative}"
+                        )
+                    lines.append(
+                        f'{name}_bucket{{{label},le="+Inf"}} {histogram.count}'
+                    )
+                    lines.append(f"{name}_sum{{{label}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{label}}} {histogram.count}")
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (metric, endpoint), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(
+                            f'{name}{{endpoint="{endpoint}"}} {value}'
+                        )
+        return "\n".join(lines) + "\n"
+
+
+class Instrumentation(object):
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config["INSTRUMENTATION_ENABLED"]:
+            return
+        app.extensions["instrumentation"] = Metrics()
+
+        request_started.connect(request_start, app)
+        request_finished.connect(request_finish, app)
+        before_render_template.connect(render_start, app)
+        template_rendered.connect(render_finish, app)
+        if not db.event.contains(Engine, "before_cursor_execute", query_start):
+            db.event.listen(Engine, "before_cursor_execute", query_start)
+            db.event.listen(Engine, "after_cursor_execute", query_finish)
+            db.event.listen(Engine, "handle_error", query_failed)
+
+        app.add_url_rule("/metrics", "metrics", metrics)
+
+    @property
+    def metrics(self):
+        return current_app.extensions["instrumentation"]
+
+
+def request_stats():
+    return g.get("request_stats") if has_app_context() else None
+
+
+def request_start(sender, **extra):
+    g.request_stats = {
+        "start": time.perf_counter(),
+        "queries": 0,
+        "db": 0.0,
+        "render": 0.0,
+        "rendering": [],
+        "slow": 0,
+    }
+
+
+def request_finish(sender, response, **extra):
+    stats = request_stats()
+    if stats is None:
+        return
+    total = time.perf_counter() - stats["start"]
+    endpoint = request.endpoint or "none"
+    metrics = instrumentation.metrics
+    metrics.observe("http_request_duration_seconds", endpoint, total)
+    metrics.observe("http_request_db_seconds", endpoint, stats["db"])
+    metrics.observe("http_request_render_seconds", endpoint, stats["render"])
+    metrics.observe(
+        "http_request_queries", endpoint, stats["queries"], QUERIES
+    )
+    for _ in range(stats["slow"]):
+        metrics.incr("http_request_slow_queries_total", endpoint)
+    response.headers["Server-Timing"] = ", ".join(
+        f"{name};dur={seconds * 1000:.1f}"
+        for name, seconds in (
+            ("db", stats["db"]),
+            ("render", stats["render"]),
+            ("total", total),
+        )
+    )
+
+
+def render_start(sender, template, context, **extra):
+    stats = request_stats()
+    if stats is not None:
+        stats["rendering"].append(time.perf_counter())
+
+
+def render_finish(sender, template, context, **extra):
+    # render_template can nest (listing fragments, post controls); only the
+    # outermost call counts towards the request
+    stats = request_stats()
+    if stats is not None and stats["rendering"]:
+        start = stats["rendering"].pop()
+        if not stats["rendering"]:
+            stats["render"] += time.perf_counter() - start
+
+
+def query_start(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def query_finish(conn, cursor, statement, parameters, context, executemany):
+    record_query(conn, statement)
+
+
+def query_failed(context):
+    # after_cursor_execute never fires for a statement that raised, and its
+    # start would stay on the pooled connection for good
+    if context.connection is not None:
+        record_query(context.connection, context.statement)
+
+
+def record_query(conn, statement):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    if not has_app_context() or "instrumentation" not in (
+        current_app.extensions
+    ):
+        return
+    stats = request_stats()
+    if stats is not None:
+        stats["queries"] += 1
+        stats["db"] += elapsed
+    if elapsed >= current_app.config["SLOW_QUERY_THRESHOLD"]:
+        if stats is not None:
+            stats["slow"] += 1
+        current_app.logger.warning(
+            f"Slow query ({elapsed * 1000:.1f} ms) from {call_site()}: "
+            f"{statement}"
+        )
+
+
+def call_site():
+    # the innermost frame of our own code that led to the query
+    root = current_app.root_path + os.sep
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(root) and frame.filename != __file__:
+            return (
+                f"{frame.filename[len(root):]}:{frame.lineno} in {frame.name}"
+            )
+    return "unknown"
+
+
+def metrics():
+    return Response(
+        instrumentation.metrics.render(),
+        mimetype="text/plain; version=0.0.4",
+    )
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta
+from threading import Event, Thread
+import json
+import uuid
+
+from flask import current_app
+
+from app import db
+from app.models import Job
+
+tasks = {}
+
+
+def task(kind):
+    # handlers get the payloads of a whole batch of jobs of their kind and
+    # return one error (or None) per payload, so they can share expensive
+    # setup such as an SMTP connection
+    def decorator(handler):
+        tasks[kind] = handler
+        return handler
+
+    return decorator
+
+
+def enqueue(kind, payload=None, delay=0):
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload),
+        status="queued",
+        attempts=0,
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    db.session.add(job)
+    db.session.commit()
+    queue.wake()
+    return job
+
+
+def claim(kind=None):
+    now = datetime.utcnow()
+    config = current_app.config
+    token = uuid.uuid4().hex
+    expired = now - timedelta(seconds=config["JOBS_LOCK_TIMEOUT"])
+    claimable = db.or_(
+        db.and_(Job.status == "queued", Job.run_at <= now),
+        db.and_(Job.status == "running", Job.locked_at < expired),
+    )
+
+    if kind is None:
+        kind = (
+            db.session.query(Job.kind)
+            .filter(claimable)
+            .order_by(Job.run_at)
+            .limit(1)
+            .scalar()
+        )
+        if kind is None:
+            return []
+    ids = [
+        row.id
+        for row in db.session.query(Job.id)
+        .filter(claimable, Job.kind == kind)
+        .order_by(Job.run_at)
+        .limit(config["JOBS_BATCH_SIZE"])
+    ]
+    if not ids:
+        return []
+    # whoever stamps the rows first owns them; other workers racing for
+    # the same ids simply update nothing
+    Job.query.filter(Job.id.in_(ids), claimable).update(
+        {
+            Job.status: "running",
+            Job.locked_by: token,
+            Job.locked_at: now,
+            Job.attempts: Job.attempts + 1,
+        },
+        synchronize_session=False,
+    )
+    db.session.commit()
+    return Job.query.filter_by(locked_by=token, status="running").all()
+
+
+def run(jobs):
+    payloads = [json.loads(job.payload) for job in jobs]
+    try:
+        errors = tasks[jobs[0].kind](payloads)
+    except Exception as error:
+        db.session.rollback()
+        errors = [error] * len(jobs)
+
+    config = current_app.config
+    for job, error in zip(jobs, errors):
+        if error is None:
+            db.session.delete(job)
+        elif job.attempts >= config["JOBS_MAX_ATTEMPTS"]:
+            job.status = "failed"
+            job.last_error = repr(error)
+            current_app.logger.error(f"Job {job.id} failed: {error!r}")
+        else:
+            job.status = "queued"
+            job.last_error = repr(error)
+            job.run_at = datetime.utcnow() + timedelta(
+                seconds=config["JOBS_RETRY_DELAY"] * 2 ** (job.attempts - 1)
+            )
+    db.session.commit()
+
+
+def run_pending(kind=None):
+    done = 0
+    jobs = claim(kind)
+    while jobs:
+        run(jobs)
+        done += len(jobs)
+        jobs = claim(kind)
+    return done
+
+
+class JobQueue(object):
+    def __init__(self, app=None):
+        self.threads = []
+        self.pending = Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        workers = app.config["JOBS_WORKERS"]
+        if not workers or app.testing:
+            return
+
+        @app.before_first_request
+        def start_job_workers():
+            while len(self.threads) < workers:
+                thread = Thread(target=self.work, args=(app,), daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def wake(self):
+        self.pending.set()
+
+    def work(self, app):
+        while True:
+            self.pending.clear()
+            with app.app_context():
+                try:
+                    run_pending()
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Job worker failed")
+                finally:
+                    db.session.remove()
+            self.pending.wait(app.config["JOBS_POLL_INTERVAL"])
+
+
+queue = JobQueue()
@@ -9,6 +9,7 @@ from wtforms.validators import (
     Optional,
 )
 from app.models import User, Post
+from app.urls import url_hash
 
 
 class EditProfileForm(FlaskForm):
@@ -62,7 +63,7 @@ class PostForm(FlaskForm):
         if len(self.text.data) > 0:
             raise ValidationError("Please choose text or link post.")
 
-        post = Post.query.filter_by(url=self.url.data).first()
+        post = Post.query.filter_by(url_canonical=url_hash(url.data)).first()
         if post is not None:
             raise ValidationError("Este link já foi postado.")
 
@@ -1,7 +1,9 @@
 from datetime import datetime
 
 from flask import (
+    abort,
     flash,
+    jsonify,
     redirect,
     render_template,
     request,
@@ -9,8 +11,13 @@ from flask import (
     current_app,
 )
 from flask_login import current_user, login_required
+from flask_wtf.csrf import validate_csrf
+from wtforms import ValidationError
 
 from app import db
+from app.cache import cache
+from app.comment_tree import CommentTree
+from app.identity import identity
 from app.main.forms import (
     CommentForm,
     EditProfileForm,
@@ -18,107 +25,192 @@ from app.main.forms import (
     EditCommentForm,
     EditPostForm,
 )
-from app.models import Comment, Post, User, Vote, Comment_Vote
+from app.models import Comment, Post, Source, User, Vote, Comment_Vote
 from app.main import bp
+from app.pagination import decode_cursor, keyset_paginate
+from app.ranking import front_page, rank_post
+from app.read_models import CommentRow, PostRow
+from app.replicas import pin_to_primary, read_only
+from app.search import COMMENT, POST, search_index
+from app.votes import has_voted, votes
 
 
 def redirect_url(default="main.index"):
     return request.args.get("next") or request.referrer or url_for(default)
 
 
-def update_renderings():
-    # TODO optimize this rendering
-    for post in Post.query.filter_by(deleted=0).all():
-        post.update()
-        db.session.commit()
+def render_listing(posts, start_rank_num):
+    return render_template(
+        "_listing.html", posts=posts, start_rank_num=start_rank_num
+    )
 
 
 @bp.route("/", methods=["GET"])
+@read_only
 def index():
-    update_renderings()
-
     page = request.args.get("page", 1, type=int)
-    posts = (
-        Post.query.filter_by(deleted=0)
-        .order_by(Post.pop_score.desc())
-        .limit(current_app.config["TOTAL_POSTS"])
-        .from_self()
-        .paginate(page, current_app.config["POSTS_PER_PAGE"], True)
-    )
 
-    start_rank_num = current_app.config["POSTS_PER_PAGE"] * (page - 1) + 1
-    next_url = (
-        url_for("main.index", page=posts.next_num) if posts.has_next else None
-    )
+    def render():
+        posts = front_page(PostRow.query()).paginate(
+            page, current_app.config["POSTS_PER_PAGE"], True
+        )
 
-    return render_template(
-        "index.html",
-        posts=posts.items,
-        next_url=next_url,
-        start_rank_num=start_rank_num,
-    )
+        start_rank_num = current_app.config["POSTS_PER_PAGE"] * (page - 1) + 1
+        next_url = (
+            url_for("main.index", page=posts.next_num)
+            if posts.has_next
+            else None
+        )
+        return (
+            render_listing(PostRow.wrap(posts.items), start_rank_num),
+            next_url,
+        )
 
+    listing, next_url = cache.listing(("index", page), render)
+    return render_template("index.html", listing=listing, next_url=next_url)
 
-@bp.route("/newest", methods=["GET"])
-def new():
-    update_renderings()
 
-    page = request.args.get("page", 1, type=int)
-    posts = (
-        Post.query.filter_by(deleted=0)
-        .order_by(Post.timestamp.desc())
-        .paginate(page, current_app.config["POSTS_PER_PAGE"], True)
-    )
+def cursor_arg():
+    after = request.args.get("after")
+    if after is None:
+        return None
+    cursor = decode_cursor(after)
+    if cursor is None:
+        abort(404)
+    return cursor
 
-    start_rank_num = current_app.config["POSTS_PER_PAGE"] * (page - 1) + 1
-    next_url = (
-        url_for("main.new", page=posts.next_num) if posts.has_next else None
-    )
 
+@bp.route("/newest", methods=["GET"])
+@read_only
+def new():
+    after = request.args.get("after")
+    cursor = cursor_arg()
+
+    def render():
+        posts = keyset_paginate(
+            PostRow.query().filter(Post.deleted == 0),
+            Post,
+            cursor,
+            current_app.config["POSTS_PER_PAGE"],
+        )
+        next_url = (
+            url_for("main.new", after=posts.next_cursor)
+            if posts.has_next
+            else None
+        )
+        return (
+            render_listing(PostRow.wrap(posts.items), posts.start_rank),
+            next_url,
+        )
+
+    listing, next_url = cache.listing(("new", after), render)
     return render_template(
-        "index.html",
-        posts=posts.items,
-        next_url=next_url,
-        start_rank_num=start_rank_num,
-        title="recentes",
+        "index.html", listing=listing, next_url=next_url, title="recentes"
     )
 
 
 @bp.route("/source/<url_base>", methods=["GET"])
+@read_only
 def posts_from_source(url_base):
-    update_renderings()
-
-    page = request.args.get("page", 1, type=int)
-    posts = (
-        Post.query.filter_by(deleted=0, url_base=url_base)
-        .order_by(Post.timestamp.desc())
-        .paginate(page, current_app.config["POSTS_PER_PAGE"], True)
-    )
-
-    start_rank_num = current_app.config["POSTS_PER_PAGE"] * (page - 1) + 1
-    next_url = (
-        url_for(
-            "main.posts_from_source", url_base=url_base, page=posts.next_num
+    source = Source.query.get_or_404(url_base)
+    after = request.args.get("after")
+    cursor = cursor_arg()
+
+    def render():
+        posts = keyset_paginate(
+            PostRow.query().filter(
+                Post.deleted == 0, Post.url_base == url_base
+            ),
+            Post,
+            cursor,
+            current_app.config["POSTS_PER_PAGE"],
+        )
+        next_url = (
+            url_for(
+                "main.posts_from_source",
+                url_base=url_base,
+                after=posts.next_cursor,
+            )
+            if posts.has_next
+            else None
+        )
+        return (
+            render_listing(PostRow.wrap(posts.items), posts.start_rank),
+            next_url,
         )
-        if posts.has_next
-        else None
-    )
 
+    listing, next_url = cache.listing(("source", url_base, after), render)
     return render_template(
         "index.html",
-        posts=posts.items,
+        listing=listing,
         next_url=next_url,
-        start_rank_num=start_rank_num,
+        source=source,
         title=f"{url_base}",
     )
 
 
+@bp.route("/sources", methods=["GET"])
+def top_sources():
+    order = request.args.get("sort")
+    column = Source.total_score if order == "score" else Source.post_count
+    sources = (
+        Source.query.filter(Source.post_count > 0)
+        .order_by(column.desc())
+        .limit(current_app.config["TOP_SOURCES"])
+        .all()
+    )
+    return render_template("sources.html", sources=sources, title="fontes")
+
+
 @bp.route("/sobre", methods=["GET"])
 def about():
     return render_template("about.html", title="about")
 
 
+@bp.route("/search", methods=["GET"])
+def search():
+    q = request.args.get("q", "").strip()[:200]
+    hits = search_index.search(q, current_app.config["SEARCH_RESULTS"])
+    post_ids = [id for kind, id in hits if kind == POST]
+    comment_ids = [id for kind, id in hits if kind == COMMENT]
+
+    comments = []
+    if comment_ids:
+        found = {
+            comment.id: comment
+            for comment in CommentRow.wrap(
+                CommentRow.query().filter(Comment.id.in_(comment_ids))
+            )
+        }
+        comments = [found[id] for id in comment_ids if id in found]
+    posts_by_id = {}
+    wanted = set(post_ids) | {comment.post_id for comment in comments}
+    if wanted:
+        posts_by_id = {
+            post.id: post
+            for post in PostRow.wrap(
+                PostRow.query().filter(Post.id.in_(wanted), Post.deleted == 0)
+            )
+        }
+    posts = [posts_by_id[id] for id in post_ids if id in posts_by_id]
+    comments = [c for c in comments if c.post_id in posts_by_id]
+
+    listing = None
+    if posts:
+        listing, _ = cache.listing(
+            None, lambda: (render_listing(posts, 1), None)
+        )
+    return render_template(
+        "search.html",
+        q=q,
+        listing=listing,
+        comments=comments,
+        posts_by_id=posts_by_id,
+    )
+
+
 @bp.route("/user/<username>", methods=["GET"])
+@read_only
 def user(username):
     user = User.query.filter_by(username=username).first_or_404()
     return render_template("user.html", user=user, title=f"{username}")
@@ -133,6 +225,8 @@ def edit_profile():
         current_user.about_me = form.about_me.data
         current_user.email = form.email.data
         db.session.commit()
+        cache.invalidate()
+        identity.invalidate(current_user.id)
         # flash("Guardámos as tuas edições.")
         return redirect(url_for("main.edit_profile"))
     elif request.method == "GET":
@@ -199,10 +293,14 @@ def submit():
                 text=form.text.data,
                 author=current_user,
                 timestamp=datetime.utcnow(),
+                score=0,
             )
             post.format_post(form.url.data)
+            rank_post(post)
             db.session.add(post)
+            Source.add_post(post)
             db.session.commit()
+            cache.invalidate()
             # flash("Parabéns! O teu post foi publicado!")
             return redirect(url_for("main.post_page", post_id=post.id))
         else:
@@ -216,14 +314,14 @@ def submit():
 
 
 @bp.route("/post/<post_id>", methods=["GET", "POST"])
+@read_only
 def post_page(post_id):
-    post = Post.query.filter_by(id=post_id).first_or_404()
-
-    comments = (
-        Comment.query.filter_by(post_id=post.id)
-        # .order_by(Comment.thread_timestamp.desc(), Comment.path.asc())
-        .order_by(Comment.thread_score.desc(), Comment.path.asc()).all()
+    post = (
+        Post.query.filter_by(id=post_id)
+        .options(db.joinedload(Post.author))
+        .first_or_404()
     )
+
     form = CommentForm()
     if form.validate_on_submit():
         if current_user.is_authenticated:
@@ -236,6 +334,7 @@ def post_page(post_id):
                     thread_timestamp=datetime.utcnow(),
                 )
                 comment.save()
+                cache.invalidate()
                 return redirect(url_for("main.post_page", post_id=post.id))
             else:
                 # flash(
@@ -245,26 +344,57 @@ def post_page(post_id):
         else:
             return redirect(url_for("auth.login"))
 
+    tree = CommentTree.for_post(post.id)
+    collapse = {
+        int(id)
+        for id in request.args.get("collapse", "").split(",")
+        if id.isdecimal()
+    }
+    thread = request.args.get("thread", type=int)
+    next_url = None
+    if thread is not None:
+        roots = tree.subtree(thread)
+        if not roots:
+            abort(404)
+    else:
+        page = request.args.get("page", 1, type=int)
+        per_page = current_app.config["COMMENT_THREADS_PER_PAGE"]
+        roots = tree.roots[(page - 1) * per_page : page * per_page]
+        if len(tree.roots) > page * per_page:
+            next_url = url_for(
+                "main.post_page", post_id=post.id, page=page + 1
+            )
+    comments = tree.flatten(
+        roots, collapse, current_app.config["COMMENTS_MAX_DEPTH"]
+    )
+
     return render_template(
-        "post.html", post=post, form=form, comments=comments, title=post.title
+        "post.html",
+        post=post,
+        form=form,
+        comments=comments,
+        thread=thread,
+        next_url=next_url,
+        title=post.title,
     )
 
 
 @bp.route("/upvote/<post_id>", methods=["GET"])
 @login_required
 def upvote(post_id):
-    post_to_upvote = Post.query.filter_by(id=post_id).first_or_404()
-    vote_query = Vote.query.filter_by(
-        user_id=current_user.id, post_id=post_to_upvote.id
-    ).first()
-    if vote_query is not None:
+    # a repeated click doesn't spend the user's vote limit
+    if has_voted("post", current_user.id, post_id):
+        pass
+    elif not current_user.can_vote():
+        pass
+    elif not Vote.record(current_user.id, post_id):
         # flash("Já votaste neste post")
         pass
+    elif not Post.update_votes(post_id):
+        abort(404)
     else:
-        post_to_upvote.update_votes()
-        vote = Vote(user_id=current_user.id, post_id=post_to_upvote.id)
-        db.session.add(vote)
         db.session.commit()
+        cache.invalidate()
 
     return redirect(redirect_url())
 
@@ -276,6 +406,7 @@ def delete_post(post_id):
     if current_user == post.author or current_user.is_admin():
         post.delete_post()
         db.session.commit()
+        cache.invalidate()
         return redirect(redirect_url())
     else:
         return render_template("errors/404.html"), 404
@@ -295,27 +426,36 @@ def delete_comment(comment_id):
 
 @bp.route("/submissions/<username>", methods=["GET"])
 def user_submissions(username):
-    update_renderings()
-
-    page = request.args.get("page", 1, type=int)
     user = User.query.filter_by(username=username).first_or_404()
 
-    posts = (
-        Post.query.filter_by(author=user, deleted=0)
-        .order_by(Post.timestamp.desc())
-        .paginate(page, current_app.config["POSTS_PER_PAGE"], True)
+    posts = keyset_paginate(
+        PostRow.query().filter(Post.user_id == user.id, Post.deleted == 0),
+        Post,
+        cursor_arg(),
+        current_app.config["POSTS_PER_PAGE"],
     )
 
-    start_rank_num = current_app.config["POSTS_PER_PAGE"] * (page - 1) + 1
     next_url = (
-        url_for("main.index", page=posts.next_num) if posts.has_next else None
+        url_for(
+            "main.user_submissions",
+            username=username,
+            after=posts.next_cursor,
+        )
+        if posts.has_next
+        else None
     )
 
+    listing, next_url = cache.listing(
+        None,
+        lambda: (
+            render_listing(PostRow.wrap(posts.items), posts.start_rank),
+            next_url,
+        ),
+    )
     return render_template(
         "index.html",
-        posts=posts.items,
+        listing=listing,
         next_url=next_url,
-        start_rank_num=start_rank_num,
         title=f"{username} posts",
     )
 
@@ -335,6 +475,7 @@ def reply(comment_id):
             thread_timestamp=parent.thread_timestamp,
         )
         comment.save()
+        cache.invalidate()
         return redirect(url_for("main.post_page", post_id=parent.post_id))
     return render_template(
         "reply.html", comment=parent, form=form, title="responder"
@@ -345,18 +486,34 @@ def reply(comment_id):
 @login_required
 def upvote_comment(comment_id):
     comment_to_upvote = Comment.query.filter_by(id=comment_id).first_or_404()
-    vote_query = Comment_Vote.query.filter_by(
-        user_id=current_user.id, comment_id=comment_to_upvote.id
-    ).first()
-    if vote_query is not None:
+    if has_voted("comment", current_user.id, comment_to_upvote.id):
+        pass
+    elif not current_user.can_vote():
+        pass
+    elif not Comment_Vote.record(current_user.id, comment_to_upvote.id):
         # ("Já votaste neste comentário.")
         pass
     else:
         comment_to_upvote.update_votes()
-        vote = Comment_Vote(
-            user_id=current_user.id, comment_id=comment_to_upvote.id
-        )
-        db.session.add(vote)
         db.session.commit()
 
     return redirect(redirect_url())
+
+
+@bp.route("/vote/<any(post, comment):kind>/<int:target_id>", methods=["POST"])
+def vote(kind, target_id):
+    # answered from the vote buffer; the score moves on the next flush
+    if not current_user.is_authenticated:
+        return jsonify(accepted=False), 401
+    if current_app.config.get("WTF_CSRF_ENABLED", True):
+        try:
+            validate_csrf(request.headers.get("X-CSRFToken"))
+        except ValidationError:
+            abort(400)
+    # nothing is read or written here: repeated votes and the vote limit
+    # are settled when the batch is written
+    accepted = votes.accept(kind, current_user.id, target_id)
+    if accepted:
+        # the voter's next pages wait for the flush on the primary
+        pin_to_primary()
+    return jsonify(accepted=accepted), 202
@@ -4,11 +4,17 @@ from time import time
 import jwt
 
 from flask_login import UserMixin
+from sqlalchemy.exc import IntegrityError
 from werkzeug.security import check_password_hash, generate_password_hash
 
-from app import db, login
+from app import db
+from app.ratelimit import limiter
+from app.rendering import render_markdown
+from app.urls import url_hash
 from flask import current_app
 
+DAY = 24 * 60 * 60
+
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -45,60 +51,68 @@ class User(UserMixin, db.Model):
         return check_password_hash(self.password_hash, password)
 
     def can_post(self):
-        if (
-            len(
-                Post.query.filter(
-                    Post.timestamp
-                    >= datetime.strftime(datetime.now(), "%Y-%m-%d")
-                )
-                .filter_by(author=self, deleted=0)
-                .all()
-            )
-            > current_app.config["USER_POSTS_PER_DAY"]
-        ):
-            return False
-        else:
-            return True
+        return limiter.hit(
+            "post", self.id, current_app.config["USER_POSTS_PER_DAY"], DAY
+        )
 
     def can_comment(self):
-        if (
-            len(
-                Comment.query.filter(
-                    Comment.timestamp
-                    >= datetime.strftime(datetime.now(), "%Y-%m-%d")
-                )
-                .filter_by(author=self)
-                .all()
-            )
-            > current_app.config["USER_COMMENTS_PER_DAY"]
-        ):
-            return False
-        else:
-            return True
+        return limiter.hit(
+            "comment",
+            self.id,
+            current_app.config["USER_COMMENTS_PER_DAY"],
+            DAY,
+        )
+
+    def can_vote(self):
+        return limiter.hit(
+            "vote", self.id, current_app.config["USER_VOTES_PER_DAY"], DAY
+        )
 
     def is_admin(self):
-        return self.email == current_app.config["MAIL_ADMIN_ADDRESS"]
+        # current_user is a fresh instance every request, so this is worked
+        # out once per request however many rows ask
+        if "_is_admin" not in self.__dict__:
+            self._is_admin = (
+                self.email == current_app.config["MAIL_ADMIN_ADDRESS"]
+            )
+        return self._is_admin
 
     def __repr__(self):
         return f"<User {self.username}>"
 
 
-@login.user_loader
-def load_user(id):
-    return User.query.get(int(id))
-
-
 class Post(db.Model):
+    __table_args__ = (
+        db.Index("ix_post_deleted_timestamp", "deleted", "timestamp"),
+        db.Index(
+            "ix_post_url_base_deleted_timestamp",
+            "url_base",
+            "deleted",
+            "timestamp",
+        ),
+        db.Index(
+            "ix_post_user_id_deleted_timestamp",
+            "user_id",
+            "deleted",
+            "timestamp",
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(80))
     url = db.Column(db.String(120))
     url_base = db.Column(db.String(50))
+    # sha1 of app.urls.canonical_url(url), for duplicate checks
+    url_canonical = db.Column(db.String(40), index=True)
     text = db.Column(db.String(280))
+    text_html = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow())
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
     score = db.Column(db.Integer, default=0)
     pop_score = db.Column(db.Float, default=0)
+    ranked_at = db.Column(db.DateTime, index=True)
     deleted = db.Column(db.Integer, default=0)
+    comment_count = db.Column(db.Integer, default=0, server_default="0")
 
     def format_post(self, url):
         if url is not None:
@@ -106,57 +120,254 @@ class Post(db.Model):
             self.url_base = "{uri.netloc}".format(uri=parsed_uri)
         else:
             self.url_base = None
+        self.url_canonical = url_hash(url)
 
         if str(url).endswith(".pdf"):
             self.title += " [pdf]"
 
     def delete_post(self):
-        self.deleted = 1
+        if not self.deleted:
+            self.deleted = 1
+            Source.remove_post(self)
 
-    def update_votes(self):
-        self.score += 1
-        self.author.karma += 1
+    @staticmethod
+    def update_votes(post_id, count=1):
+        # increments happen in SQL so concurrent votes can't lose updates;
+        # clearing ranked_at queues the post for the next ranking refresh
+        updated = Post.query.filter_by(id=post_id).update(
+            {Post.score: Post.score + count, Post.ranked_at: None},
+            synchronize_session=False,
+        )
+        author_id = (
+            db.session.query(Post.user_id).filter_by(id=post_id).as_scalar()
+        )
+        User.query.filter(User.id == author_id).update(
+            {User.karma: User.karma + count}, synchronize_session=False
+        )
+        url_base = (
+            db.session.query(Post.url_base)
+            .filter_by(id=post_id, deleted=0)
+            .as_scalar()
+        )
+        Source.query.filter(Source.url_base == url_base).update(
+            {Source.total_score: Source.total_score + count},
+            synchronize_session=False,
+        )
+        return updated
 
     def total_comments(self):
-        return len(Comment.query.filter_by(post_id=self.id).all())
+        return self.comment_count or 0
 
-    def update(self, gravity=1.8):
-        datetime_difference = datetime.utcnow() - self.timestamp
+    @property
+    def author_username(self):
+        # same attribute as the listing rows in app/read_models.py
+        return self.author.username if self.author else None
+
+    @staticmethod
+    def hot_score(score, timestamp, now, gravity=1.8):
+        datetime_difference = now - timestamp
         hours_passed = (
             datetime_difference.days * 24 + datetime_difference.seconds / 3600
         )
-        self.pop_score = (self.score - 1) / pow((hours_passed + 2), gravity)
+        return (score - 1) / pow((hours_passed + 2), gravity)
+
+    def update(self, gravity=1.8):
+        now = datetime.utcnow()
+        self.pop_score = Post.hot_score(
+            self.score, self.timestamp, now, gravity
+        )
+        self.ranked_at = now
 
     def __repr__(self):
         return f"<Post {self.title}>"
 
 
+def insert_ignore(model, **values):
+    # True if the row was inserted, False if it clashed with a unique index
+    table = model.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+
+        statement = insert(table).values(**values).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        statement = table.insert().values(**values).prefix_with("OR IGNORE")
+    elif dialect == "mysql":
+        statement = table.insert().values(**values).prefix_with("IGNORE")
+    else:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert().values(**values))
+        except IntegrityError:
+            return False
+        return True
+    return db.session.execute(statement).rowcount == 1
+
+
+class Source(db.Model):
+    # running totals per url_base, kept in step with submit/vote/delete so
+    # the sources pages never aggregate over post
+    url_base = db.Column(db.String(50), primary_key=True)
+    post_count = db.Column(db.Integer, default=0, index=True)
+    total_score = db.Column(db.Integer, default=0, index=True)
+    last_post_at = db.Column(db.DateTime)
+
+    @staticmethod
+    def add_post(post):
+        if not post.url_base:
+            return
+        insert_ignore(
+            Source, url_base=post.url_base, post_count=0, total_score=0
+        )
+        Source.query.filter_by(url_base=post.url_base).update(
+            {
+                Source.post_count: Source.post_count + 1,
+                Source.total_score: Source.total_score + (post.score or 0),
+                Source.last_post_at: db.case(
+                    [
+                        (
+                            Source.last_post_at > post.timestamp,
+                            Source.last_post_at,
+                        )
+                    ],
+                    else_=post.timestamp,
+                ),
+            },
+            synchronize_session=False,
+        )
+
+    @staticmethod
+    def remove_post(post):
+        if not post.url_base:
+            return
+        last_post_at = (
+            db.session.query(db.func.max(Post.timestamp))
+            .filter(
+                Post.url_base == post.url_base,
+                Post.deleted == 0,
+                Post.id != post.id,
+            )
+            .as_scalar()
+        )
+        score = db.session.query(Post.score).filter_by(id=post.id).as_scalar()
+        Source.query.filter_by(url_base=post.url_base).update(
+            {
+                Source.post_count: Source.post_count - 1,
+                Source.total_score: Source.total_score - score,
+                Source.last_post_at: last_post_at,
+            },
+            synchronize_session=False,
+        )
+
+    def __repr__(self):
+        return f"<Source {self.url_base}: {self.post_count}>"
+
+
 class Vote(db.Model):
+    __table_args__ = (
+        db.Index("ix_vote_user_id_post_id", "user_id", "post_id", unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
     post_id = db.Column(db.Integer, db.ForeignKey("post.id"))
 
+    @staticmethod
+    def record(user_id, post_id):
+        return insert_ignore(Vote, user_id=user_id, post_id=post_id)
+
     def __repr__(self):
         return f"<User: {self.user_id} Post: {self.post_id}>"
 
 
 class Comment_Vote(db.Model):
+    __table_args__ = (
+        db.Index(
+            "ix_comment__vote_user_id_comment_id",
+            "user_id",
+            "comment_id",
+            unique=True,
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
     comment_id = db.Column(db.Integer, db.ForeignKey("comment.id"))
 
+    @staticmethod
+    def record(user_id, comment_id):
+        return insert_ignore(
+            Comment_Vote, user_id=user_id, comment_id=comment_id
+        )
+
     def __repr__(self):
         return f"<User: {self.user_id} Post: {self.comment_id}>"
 
 
+class RateLimit(db.Model):
+    key = db.Column(db.String(120), primary_key=True)
+    count = db.Column(db.Integer, default=0)
+    expires_at = db.Column(db.DateTime, index=True)
+
+    def __repr__(self):
+        return f"<RateLimit {self.key}: {self.count}>"
+
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), index=True)
+    payload = db.Column(db.Text)
+    status = db.Column(db.String(10), index=True, default="queued")
+    attempts = db.Column(db.Integer, default=0)
+    run_at = db.Column(db.DateTime, index=True, default=datetime.utcnow)
+    locked_by = db.Column(db.String(32), index=True)
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind}: {self.status}>"
+
+
+class SearchTerm(db.Model):
+    # inverted index used where SQLite FTS5 isn't available; doc packs the
+    # kind into the low bit of the id (see app.search)
+    term = db.Column(db.String(64), primary_key=True)
+    doc = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+    __table_args__ = (db.Index("ix_search_term_doc", "doc"),)
+
+    def __repr__(self):
+        return f"<SearchTerm {self.term}: {self.doc}>"
+
+
+FTS_TABLE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING "
+    "fts5(title, body, tokenize='unicode61 remove_diacritics 2')"
+)
+
+
+@db.event.listens_for(SearchTerm.__table__, "after_create")
+def create_fts_table(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.execute(FTS_TABLE)
+
+
+@db.event.listens_for(SearchTerm.__table__, "after_drop")
+def drop_fts_table(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.execute("DROP TABLE IF EXISTS search_fts")
+
+
 class Comment(db.Model):
     _N = 6
 
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.String(300))
+    text_html = db.Column(db.Text)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow())
-    path = db.Column(db.String(60), index=True)
+    # 27 levels of "{id:06d}." and still indexable as utf8mb4 on MySQL
+    path = db.Column(db.String(190), index=True)
     parent_id = db.Column(db.Integer, db.ForeignKey("comment.id"))
     replies = db.relationship(
         "Comment",
@@ -170,27 +381,68 @@ class Comment(db.Model):
     score = db.Column(db.Integer, default=0)
     thread_score = db.Column(db.Integer, default=0)
 
-    def update_votes(self):
-        self.score += 1
+    def update_votes(self, count=1):
+        Comment.query.filter_by(id=self.id).update(
+            {Comment.score: Comment.score + count}, synchronize_session=False
+        )
         if self.parent_id is None:
-            self.thread_score = self.score
-            for child_comment in Comment.query.filter(
-                Comment.path.like(self.path + "%")
-            ):
-                child_comment.thread_score = self.thread_score
-                db.session.commit()
+            Comment.query.filter(
+                Comment.post_id == self.post_id,
+                Comment.path.like(self.path + "%"),
+            ).update(
+                {Comment.thread_score: Comment.thread_score + count},
+                synchronize_session=False,
+            )
 
-    def save(self):
-        db.session.add(self)
-        db.session.commit()
-        prefix = self.parent.path + "." if self.parent else ""
-        self.path = prefix + "{:0{}d}".format(self.id, self._N)
-        db.session.commit()
+    def save(self, attempts=3):
+        # the id is picked before the insert so the path goes out with it.
+        # The post's counter is bumped first: on SQLite that takes the write
+        # lock, so nobody else can claim max(id) + 1 before we insert it;
+        # elsewhere a clash on the primary key just tries the next one
+        parent = self.parent
+        if parent is None and self.parent_id is not None:
+            # the reply views load the parent already: no query
+            parent = Comment.query.get(self.parent_id)
+        prefix = parent.path + "." if parent else ""
+        for attempt in range(attempts):
+            # an author already in the session cascades us into it too
+            with db.session.no_autoflush:
+                Post.query.filter_by(id=self.post_id).update(
+                    {Post.comment_count: Post.comment_count + 1},
+                    synchronize_session=False,
+                )
+                self.id = (
+                    db.session.query(
+                        db.func.coalesce(db.func.max(Comment.id), 0)
+                    ).scalar()
+                    + 1
+                )
+            self.path = prefix + "{:0{}d}".format(self.id, self._N)
+            db.session.add(self)
+            try:
+                db.session.commit()
+                return
+            except IntegrityError:
+                db.session.rollback()
+                if attempt == attempts - 1:
+                    raise
 
     def level(self):
         return len(self.path) // self._N - 1
 
+    @property
+    def author_username(self):
+        return self.author.username if self.author else None
+
     def __repr__(self):
         return (
             f"<Comment: {self.text} Post: {self.post_id} User: {self.user_id}>"
         )
+
+
+# keep the rendered markdown in step with every write to the text,
+# including edits and "[Deleted]"
+@db.event.listens_for(Post.text, "set")
+@db.event.listens_for(Comment.text, "set")
+def render_text(target, value, oldvalue, initiator):
+    target.text_html = render_markdown(value)
@@ -0,0 +1,61 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+import binascii
+import json
+
+from app import db
+
+
+class KeysetPage(object):
+    def __init__(self, items, next_cursor, start_rank):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.start_rank = start_rank
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(timestamp, id, rank):
+    payload = json.dumps([timestamp.isoformat(), id, rank])
+    return urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        timestamp, id, rank = json.loads(urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(timestamp), int(id), int(rank)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+def keyset_paginate(query, model, cursor, per_page):
+    # newest first on (timestamp, id): each page seeks straight to the
+    # last row of the previous one instead of counting past an OFFSET,
+    # and no COUNT(*) is needed to know whether there is a next page
+    start_rank = 1
+    if cursor is not None:
+        timestamp, id, rank = cursor
+        query = query.filter(
+            db.or_(
+                model.timestamp < timestamp,
+                db.and_(model.timestamp == timestamp, model.id < id),
+            )
+        )
+        start_rank = rank
+    items = (
+        query.order_by(model.timestamp.desc(), model.id.desc())
+        .limit(per_page + 1)
+        .all()
+    )
+
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor(
+            last.timestamp, last.id, start_rank + per_page
+        )
+    return KeysetPage(items, next_cursor, start_rank)
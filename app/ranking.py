@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+from threading import Thread
+import time
+
+from flask import current_app
+
+from app import db
+from app.cache import cache
+from app.models import Post
+
+
+def front_page(query=None):
+    # Post objects with their authors, or the rows of a column query
+    ranked = (
+        (Post.query if query is None else query)
+        .filter(Post.deleted == 0)
+        .order_by(Post.pop_score.desc())
+        .limit(current_app.config["TOTAL_POSTS"])
+        .from_self()
+    )
+    if query is None:
+        ranked = ranked.options(db.joinedload(Post.author))
+    return ranked
+
+
+def rank_post(post):
+    post.update(gravity=current_app.config["RANKING_GRAVITY"])
+
+
+def stale_posts(now=None):
+    # only posts that can still reach the front page are worth re-ranking:
+    # anything recent or freshly voted on, plus whatever currently sits on
+    # the front page
+    now = now or datetime.utcnow()
+    stale_before = now - timedelta(
+        seconds=current_app.config["RANKING_REFRESH_INTERVAL"]
+    )
+    window_start = now - timedelta(
+        hours=current_app.config["RANKING_WINDOW_HOURS"]
+    )
+    stale = db.or_(Post.ranked_at.is_(None), Post.ranked_at < stale_before)
+    columns = (Post.id, Post.score, Post.timestamp)
+
+    recent = (
+        db.session.query(*columns)
+        .filter(
+            Post.deleted == 0,
+            db.or_(Post.timestamp >= window_start, Post.ranked_at.is_(None)),
+            stale,
+        )
+        .all()
+    )
+    front_page_ids = (
+        db.session.query(Post.id)
+        .filter(Post.deleted == 0)
+        .order_by(Post.pop_score.desc())
+        .limit(current_app.config["TOTAL_POSTS"])
+        .subquery()
+    )
+    top = (
+        db.session.query(*columns)
+        .join(front_page_ids, front_page_ids.c.id == Post.id)
+        .filter(stale)
+        .all()
+    )
+    return list({row[0]: row for row in recent + top}.values())
+
+
+def hot_scores(rows, now, gravity):
+    return [
+        {
+            "id": id,
+            "pop_score": Post.hot_score(score, timestamp, now, gravity),
+            "ranked_at": now,
+        }
+        for id, score, timestamp in rows
+    ]
+
+
+def refresh_rankings():
+    now = datetime.utcnow()
+    scores = hot_scores(
+        stale_posts(now), now, current_app.config["RANKING_GRAVITY"]
+    )
+    # one executemany UPDATE instead of flushing ORM objects one by one
+    db.session.bulk_update_mappings(Post, scores)
+    db.session.commit()
+    if scores:
+        cache.invalidate()
+    return len(scores)
+
+
+class RankingScheduler(object):
+    def __init__(self, app=None):
+        self.thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        interval = app.config["RANKING_REFRESH_INTERVAL"]
+        if not interval or app.testing:
+            return
+
+        # started lazily so `flask db upgrade` & friends don't spawn it
+        @app.before_first_request
+        def start_ranking_scheduler():
+            if self.thread is None:
+                self.thread = Thread(
+                    target=self.run, args=(app, interval), daemon=True
+                )
+                self.thread.start()
+
+    def run(self, app, interval):
+        while True:
+            with app.app_context():
+                try:
+                    refresh_rankings()
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Ranking refresh failed")
+                finally:
+                    db.session.remove()
+            time.sleep(interval)
+
+
+scheduler = RankingScheduler()
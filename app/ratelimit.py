@@ -0,0 +1,116 @@
+from datetime import datetime
+from threading import Lock
+import time
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+
+
+class MemoryStore(object):
+    # per process, so each gunicorn worker keeps its own counters
+    sweep_interval = 60
+
+    def __init__(self):
+        self.counters = {}
+        self.lock = Lock()
+        self.next_sweep = 0
+
+    def incr(self, key, expires_at, amount=1):
+        now = time.time()
+        with self.lock:
+            if now >= self.next_sweep:
+                self.counters = {
+                    k: v for k, v in self.counters.items() if v[1] > now
+                }
+                self.next_sweep = now + self.sweep_interval
+            count, expiry = self.counters.get(key, (0, expires_at))
+            if expiry <= now:
+                count, expiry = 0, expires_at
+            self.counters[key] = (count + amount, expiry)
+            return count + amount
+
+
+class SQLStore(object):
+    # counters live in the request's transaction: a denied or failed
+    # request rolls its hit back together with everything else
+    def incr(self, key, expires_at, amount=1):
+        from app.models import RateLimit
+
+        updated = RateLimit.query.filter_by(key=key).update(
+            {RateLimit.count: RateLimit.count + amount},
+            synchronize_session=False,
+        )
+        if updated:
+            return self.get(key)
+
+        expiry = datetime.utcfromtimestamp(expires_at)
+        RateLimit.query.filter(
+            RateLimit.expires_at < datetime.utcnow()
+        ).delete(synchronize_session=False)
+        try:
+            with db.session.begin_nested():
+                db.session.add(
+                    RateLimit(key=key, count=amount, expires_at=expiry)
+                )
+        except IntegrityError:
+            return self.incr(key, expires_at, amount)
+        return amount
+
+    def get(self, key):
+        from app.models import RateLimit
+
+        return (
+            db.session.query(RateLimit.count).filter_by(key=key).scalar() or 0
+        )
+
+
+class RedisStore(object):
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def incr(self, key, expires_at, amount=1):
+        pipe = self.client.pipeline()
+        pipe.incrby(key, amount)
+        pipe.expireat(key, int(expires_at))
+        return pipe.execute()[0]
+
+
+class RateLimiter(object):
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        url = app.config["RATELIMIT_STORAGE_URL"]
+        if url.startswith("redis://"):
+            store = RedisStore(url)
+        elif url.startswith("memory://"):
+            store = MemoryStore()
+        else:
+            store = SQLStore()
+        app.extensions["ratelimit"] = store
+
+    @property
+    def store(self):
+        return current_app.extensions["ratelimit"]
+
+    def window(self, action, identity, period):
+        # fixed windows aligned on the epoch, so daily limits reset at
+        # midnight UTC like the timestamps they replace
+        window = int(time.time() // period)
+        return f"{action}:{identity}:{window}", (window + 1) * period
+
+    def hit(self, action, identity, limit, period):
+        return self.spend(action, identity, period) <= limit
+
+    def spend(self, action, identity, period, amount=1):
+        # the window's count once amount is added to it
+        key, expires_at = self.window(action, identity, period)
+        return self.store.incr(key, expires_at, amount)
+
+
+limiter = RateLimiter()
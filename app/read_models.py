@@ -0,0 +1,85 @@
+from app import db
+from app.models import Comment, Post, User
+
+
+class Row(object):
+    # what a listing shows of a post or comment, read straight from column
+    # queries: no identity map, no change tracking, no lazy author to load.
+    # Subclasses list their slots in the order of their query's columns
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def wrap(cls, rows):
+        return [cls(*row) for row in rows]
+
+
+class PostRow(Row):
+    __slots__ = (
+        "id",
+        "title",
+        "url",
+        "url_base",
+        "text",
+        "score",
+        "timestamp",
+        "user_id",
+        "comment_count",
+        "author_username",
+    )
+
+    @staticmethod
+    def query():
+        return db.session.query(
+            Post.id,
+            Post.title,
+            Post.url,
+            Post.url_base,
+            Post.text,
+            Post.score,
+            Post.timestamp,
+            Post.user_id,
+            Post.comment_count,
+            User.username,
+        ).outerjoin(User, User.id == Post.user_id)
+
+    def total_comments(self):
+        return self.comment_count or 0
+
+
+class CommentRow(Row):
+    __slots__ = (
+        "id",
+        "post_id",
+        "parent_id",
+        "path",
+        "text",
+        "text_html",
+        "score",
+        "thread_score",
+        "timestamp",
+        "user_id",
+        "author_username",
+    )
+
+    @staticmethod
+    def query():
+        return db.session.query(
+            Comment.id,
+            Comment.post_id,
+            Comment.parent_id,
+            Comment.path,
+            Comment.text,
+            Comment.text_html,
+            Comment.score,
+            Comment.thread_score,
+            Comment.timestamp,
+            Comment.user_id,
+            User.username,
+        ).outerjoin(User, User.id == Comment.user_id)
+
+    def level(self):
+        return len(self.path) // Comment._N - 1
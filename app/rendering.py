@@ -0,0 +1,17 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import escape
+import markdown
+
+
+def render_markdown(text):
+    # same output as `{% filter markdown %}{{ text }}{% endfilter %}`:
+    # the text is escaped first, then converted
+    if text is None:
+        return None
+    return markdown.markdown(str(escape(text)))
+
+
+def render_many(texts, workers=None):
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(render_markdown, texts, chunksize=64))
@@ -0,0 +1,128 @@
+from functools import wraps
+import random
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import orm
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.expression import UpdateBase
+
+
+class RoutingSession(SignallingSession):
+    # reads from views marked read_only go to one replica per session;
+    # flushes and INSERT/UPDATE/DELETE statements always go to the primary,
+    # and so does every read that follows a write
+    def get_bind(self, mapper=None, clause=None):
+        if self._flushing or isinstance(clause, UpdateBase):
+            if has_request_context():
+                g.wrote_primary = True
+        elif reads_from_replica():
+            if "replica" not in self.info:
+                self.info["replica"] = random.choice(replicas.binds(self.app))
+            return replicas.engine(self.app, self.info["replica"])
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def reads_from_replica():
+    return (
+        has_request_context()
+        and g.get("read_only", False)
+        and bool(replicas.binds(current_app))
+        and not pinned_to_primary()
+    )
+
+
+def pinned_to_primary():
+    # the session wrote a moment ago, and the replicas may not have it yet
+    return (
+        has_request_context()
+        and bool(replicas.binds(current_app))
+        and (
+            g.get("wrote_primary", False)
+            or session.get("primary_until", 0) >= time.time()
+        )
+    )
+
+
+def pin_to_primary():
+    # for writes that reach the primary after the response, like buffered
+    # votes
+    g.wrote_primary = True
+
+
+def read_only(view):
+    # GETs of the decorated view may be served from a replica
+    @wraps(view)
+    def decorated(*args, **kwargs):
+        if request.method in ("GET", "HEAD"):
+            g.read_only = True
+        return view(*args, **kwargs)
+
+    return decorated
+
+
+class Replicas(object):
+    # replicas are registered as Flask-SQLAlchemy binds, so they share its
+    # engine handling and the pool options below
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+        options = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+        in_memory = url.database in (None, "", ":memory:")
+        if url.get_backend_name() != "sqlite":
+            options = dict(app.config["DATABASE_POOL_OPTIONS"], **options)
+        elif not in_memory and "poolclass" not in options:
+            # a file would get a NullPool otherwise, and a new connection
+            # for every checkout. Connections are only ever used by one
+            # thread at a time, but not always the one that opened them
+            connect_args = dict(options.get("connect_args") or {})
+            connect_args.setdefault("check_same_thread", False)
+            options = dict(
+                app.config["SQLITE_POOL_OPTIONS"],
+                poolclass=QueuePool,
+                **options,
+            )
+            options["connect_args"] = connect_args
+        # in memory SQLite is left to Flask-SQLAlchemy's StaticPool
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+        urls = app.config["DATABASE_REPLICA_URLS"]
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        binds.update(
+            (f"replica{number}", url) for number, url in enumerate(urls)
+        )
+        app.config["SQLALCHEMY_BINDS"] = binds or None
+        app.extensions["replicas"] = [
+            f"replica{number}" for number in range(len(urls))
+        ]
+        if urls:
+            app.after_request(stick_to_primary)
+
+    def binds(self, app):
+        return app.extensions["replicas"]
+
+    def engine(self, app, bind):
+        return app.extensions["sqlalchemy"].db.get_engine(app, bind)
+
+
+def stick_to_primary(response):
+    # a user who just wrote reads from the primary for a while, so the
+    # replicas have time to catch up with their own writes
+    if g.get("wrote_primary", False):
+        session["primary_until"] = (
+            time.time() + current_app.config["DATABASE_STICKY_SECONDS"]
+        )
+    return response
+
+
+replicas = Replicas()
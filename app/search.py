@@ -0,0 +1,235 @@
+import re
+import unicodedata
+
+from flask import current_app
+from sqlalchemy import text
+
+from app import db
+from app.models import Comment, Post, SearchTerm
+
+POST, COMMENT = 0, 1
+DELETED_COMMENT = "[Deleted]"
+WORD = re.compile(r"\w+")
+
+
+def doc_key(kind, id):
+    return id * 2 + kind
+
+
+def split_key(doc):
+    return doc & 1, doc >> 1
+
+
+def tokenize(value):
+    # lower case, accents folded, the same way FTS5's unicode61 does it
+    value = unicodedata.normalize("NFKD", (value or "").lower())
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return [word[:64] for word in WORD.findall(value) if len(word) > 1]
+
+
+class FTS5Index(object):
+    def add(self, connection, docs):
+        self.remove(connection, [doc for doc, _, _ in docs])
+        self.insert(connection, docs)
+
+    def insert(self, connection, docs):
+        connection.execute(
+            text(
+                "INSERT INTO search_fts (rowid, title, body) "
+                "VALUES (:doc, :title, :body)"
+            ),
+            [
+                {"doc": doc, "title": title or "", "body": body or ""}
+                for doc, title, body in docs
+            ],
+        )
+
+    def remove(self, connection, docs):
+        if docs:
+            connection.execute(
+                text("DELETE FROM search_fts WHERE rowid = :doc"),
+                [{"doc": doc} for doc in docs],
+            )
+
+    def clear(self, connection):
+        connection.execute(text("DELETE FROM search_fts"))
+
+    def search(self, connection, terms, kind, limit, candidates=1000):
+        # bm25 over the newest matches of one kind only: walking the doclist
+        # by rowid stops early, so common words cost no more than rare ones
+        match = " ".join(f'"{term}"' for term in terms)
+        return [
+            row[0]
+            for row in connection.execute(
+                text(
+                    "SELECT rowid FROM ("
+                    "SELECT rowid, rank FROM search_fts "
+                    "WHERE search_fts MATCH :match AND (rowid & 1) = :kind "
+                    "ORDER BY rowid DESC LIMIT :candidates"
+                    ") ORDER BY rank LIMIT :limit"
+                ),
+                match=match,
+                kind=kind,
+                candidates=candidates,
+                limit=limit,
+            )
+        ]
+
+
+class TermIndex(object):
+    table = SearchTerm.__table__
+
+    def add(self, connection, docs):
+        self.remove(connection, [doc for doc, _, _ in docs])
+        self.insert(connection, docs)
+
+    def insert(self, connection, docs):
+        rows = [
+            {"term": term, "doc": doc}
+            for doc, title, body in docs
+            for term in set(tokenize(title) + tokenize(body))
+        ]
+        if rows:
+            connection.execute(self.table.insert(), rows)
+
+    def remove(self, connection, docs):
+        if docs:
+            connection.execute(
+                self.table.delete().where(self.table.c.doc.in_(docs))
+            )
+
+    def clear(self, connection):
+        connection.execute(self.table.delete())
+
+    def search(self, connection, terms, kind, limit):
+        # documents of one kind holding every term, newest first
+        terms = set(terms)
+        query = (
+            db.select([self.table.c.doc])
+            .where(self.table.c.term.in_(terms))
+            .where(self.table.c.doc.op("%")(2) == kind)
+            .group_by(self.table.c.doc)
+            .having(db.func.count() == len(terms))
+            .order_by(self.table.c.doc.desc())
+            .limit(limit)
+        )
+        return [row[0] for row in connection.execute(query)]
+
+
+class SearchIndex(object):
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["search"] = None
+        if not db.event.contains(db.session, "after_flush", index_changes):
+            db.event.listen(db.session, "after_flush", index_changes)
+
+    @property
+    def backend(self):
+        backend = current_app.extensions["search"]
+        if backend is None:
+            name = current_app.config["SEARCH_BACKEND"]
+            if name == "auto":
+                sqlite = db.engine.dialect.name == "sqlite"
+                name = "fts5" if sqlite else "terms"
+            backend = FTS5Index() if name == "fts5" else TermIndex()
+            current_app.extensions["search"] = backend
+        return backend
+
+    def index_changes(self, session):
+        docs, removed = [], []
+        for obj in session.new | session.dirty:
+            if isinstance(obj, Post):
+                if obj.deleted:
+                    removed.append(doc_key(POST, obj.id))
+                elif changed(obj, session, "title", "text"):
+                    docs.append((doc_key(POST, obj.id), obj.title, obj.text))
+            elif isinstance(obj, Comment):
+                if obj.text == DELETED_COMMENT:
+                    removed.append(doc_key(COMMENT, obj.id))
+                elif changed(obj, session, "text"):
+                    docs.append((doc_key(COMMENT, obj.id), None, obj.text))
+        for obj in session.deleted:
+            if isinstance(obj, Post):
+                removed.append(doc_key(POST, obj.id))
+            elif isinstance(obj, Comment):
+                removed.append(doc_key(COMMENT, obj.id))
+
+        if docs or removed:
+            connection = session.connection()
+            if docs:
+                self.backend.add(connection, docs)
+            self.backend.remove(connection, removed)
+
+    def search(self, query, limit):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        # posts and comments are looked up apart: comments far outnumber
+        # posts, and would otherwise crowd them out of every common word
+        connection = db.session.connection()
+        return [
+            split_key(doc)
+            for kind in (POST, COMMENT)
+            for doc in self.backend.search(connection, terms, kind, limit)
+        ]
+
+    def reindex(self, batch=1000):
+        counts = {}
+        self.backend.clear(db.session.connection())
+        sources = (
+            (
+                POST,
+                db.session.query(Post.id, Post.title, Post.text).filter(
+                    Post.deleted == 0
+                ),
+                Post,
+            ),
+            (
+                COMMENT,
+                db.session.query(Comment.id, db.null(), Comment.text).filter(
+                    Comment.text != DELETED_COMMENT
+                ),
+                Comment,
+            ),
+        )
+        for kind, query, model in sources:
+            last_id, counts[model.__tablename__] = 0, 0
+            while True:
+                rows = (
+                    query.filter(model.id > last_id)
+                    .order_by(model.id)
+                    .limit(batch)
+                    .all()
+                )
+                if not rows:
+                    break
+                self.backend.insert(
+                    db.session.connection(),
+                    [
+                        (doc_key(kind, id), title, body)
+                        for id, title, body in rows
+                    ],
+                )
+                db.session.commit()
+                last_id = rows[-1][0]
+                counts[model.__tablename__] += len(rows)
+        db.session.commit()
+        return counts
+
+
+def changed(obj, session, *attributes):
+    if obj in session.new:
+        return True
+    state = db.inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+search_index = SearchIndex()
+
+
+def index_changes(session, context):
+    # index writes ride along in the transaction that changed the text
+    search_index.index_changes(session)
@@ -0,0 +1,87 @@
+from threading import Lock, RLock
+import sqlite3
+
+from flask import current_app, has_app_context
+from sqlalchemy.engine import Engine
+
+from app import db
+
+WRITES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+writer_locks = {}
+writer_locks_lock = Lock()
+
+
+class SQLiteProfile(object):
+    # applied to every SQLite connection opened under an app that has it,
+    # primary and replicas alike; other databases are left alone
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["sqlite"] = self
+        if not db.event.contains(Engine, "connect", set_pragmas):
+            db.event.listen(Engine, "connect", set_pragmas)
+            db.event.listen(Engine, "before_cursor_execute", start_write)
+            db.event.listen(Engine, "commit", end_write)
+            db.event.listen(Engine, "rollback", end_write)
+            db.event.listen(Engine, "checkin", release_writer)
+
+
+def enabled():
+    return has_app_context() and "sqlite" in current_app.extensions
+
+
+def set_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection) or not enabled():
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in current_app.config["SQLITE_PRAGMAS"].items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+    cursor.close()
+
+
+def writer_lock(conn):
+    # one per database file: the threads of a worker queue up here instead
+    # of spinning in SQLite's busy handler. Reentrant, so a thread writing
+    # through a second connection falls back on busy_timeout
+    with writer_locks_lock:
+        database = conn.engine.url.database
+        if database not in writer_locks:
+            writer_locks[database] = RLock()
+        return writer_locks[database]
+
+
+def start_write(conn, cursor, statement, parameters, context, executemany):
+    if (
+        conn.dialect.name != "sqlite"
+        or "writer" in conn.info
+        or not statement.lstrip().upper().startswith(WRITES)
+        or not enabled()
+        or not current_app.config["SQLITE_SERIALIZE_WRITES"]
+    ):
+        return
+    # pysqlite opens the transaction at the first write, so holding the
+    # lock from here until commit covers the whole write transaction
+    lock = writer_lock(conn)
+    timeout = current_app.config["SQLITE_PRAGMAS"].get("busy_timeout", 5000)
+    if lock.acquire(timeout=timeout / 1000):
+        conn.info["writer"] = lock
+
+
+def end_write(conn):
+    lock = conn.info.pop("writer", None)
+    if lock is not None:
+        lock.release()
+
+
+def release_writer(dbapi_connection, connection_record):
+    # a connection handed back mid-transaction is rolled back by the pool
+    # without a rollback event
+    lock = connection_record.info.pop("writer", None)
+    if lock is not None:
+        lock.release()
+
+
+sqlite_profile = SQLiteProfile()
@@ -0,0 +1,32 @@
+// votes go out as a background POST to /vote/<kind>/<id>; the plain links
+// stay as the fallback. The URL is built here rather than with url_for in
+// the templates, which would cost a call per comment on long threads
+document.addEventListener("click", function (event) {
+  var link = event.target.closest("a[data-vote]");
+  var token = document.querySelector("meta[name=csrf-token]");
+  if (!link || !token || !window.fetch) {
+    return;
+  }
+  event.preventDefault();
+  fetch("/vote/" + link.dataset.vote, {
+    method: "POST",
+    credentials: "same-origin",
+    headers: { "X-CSRFToken": token.content, Accept: "application/json" },
+  })
+    .then(function (response) {
+      if (!response.ok) {
+        throw response;
+      }
+      return response.json();
+    })
+    .then(function (result) {
+      link.classList.add("nosee");
+      var score = document.getElementById(link.dataset.score);
+      if (result.accepted && score) {
+        score.textContent = parseInt(score.textContent, 10) + 1;
+      }
+    })
+    .catch(function () {
+      window.location = link.href;
+    });
+});
@@ -0,0 +1,67 @@
+from datetime import datetime
+from functools import lru_cache
+
+MONTHS = (
+    "janeiro",
+    "fevereiro",
+    "março",
+    "abril",
+    "maio",
+    "junho",
+    "julho",
+    "agosto",
+    "setembro",
+    "outubro",
+    "novembro",
+    "dezembro",
+)
+
+
+@lru_cache(maxsize=4096)
+def minutes_ago(minutes):
+    # moment.js' fromNow with its pt locale, at the resolution of a minute
+    if minutes < 1:
+        return "há poucos segundos"
+    if minutes < 2:
+        return "há um minuto"
+    if minutes < 45:
+        return f"há {minutes} minutos"
+    hours = round(minutes / 60)
+    if hours <= 1:
+        return "há uma hora"
+    if hours < 22:
+        return f"há {hours} horas"
+    days = round(minutes / 1440)
+    if days <= 1:
+        return "há um dia"
+    if days < 26:
+        return f"há {days} dias"
+    months = round(days / 30.4)
+    if months <= 1:
+        return "há um mês"
+    if months < 11:
+        return f"há {months} meses"
+    years = round(days / 365)
+    if years <= 1:
+        return "há um ano"
+    return f"há {years} anos"
+
+
+def time_ago(timestamp, now=None):
+    # timestamps are naive UTC, like everything written by the models
+    if timestamp is None:
+        return ""
+    now = now or datetime.utcnow()
+    return minutes_ago(max(0, int((now - timestamp).total_seconds() // 60)))
+
+
+def long_date(timestamp):
+    if timestamp is None:
+        return ""
+    month = MONTHS[timestamp.month - 1]
+    return f"{timestamp.day} de {month} de {timestamp.year}"
+
+
+def register(app):
+    app.add_template_filter(time_ago, "timeago")
+    app.add_template_filter(long_date, "longdate")
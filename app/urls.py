@@ -0,0 +1,40 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit
+import hashlib
+
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "igshid", "ref_src"}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonical_url(url):
+    # scheme-less "host/path?query": http and https, www., a trailing
+    # slash, tracking parameters, parameter order and the fragment never
+    # make two links different
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    try:
+        port = parts.port if parts.hostname else None
+    except ValueError:
+        # out of range or not a number: older links can have either, and
+        # the raw text still tells them apart
+        port = parts.netloc.rpartition("@")[2].rpartition(":")[2]
+    if port and port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f"{host}:{port}"
+
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_")
+        and key.lower() not in TRACKING_PARAMS
+    )
+    canonical = host + parts.path.rstrip("/")
+    if query:
+        canonical += "?" + urlencode(query)
+    return canonical
+
+
+def url_hash(url):
+    if not url:
+        return None
+    return hashlib.sha1(canonical_url(url).encode()).hexdigest()
@@ -0,0 +1,180 @@
+from threading import Event, Lock, Thread
+import atexit
+
+from flask import current_app
+from flask_wtf.csrf import generate_csrf
+
+from app import db
+from app.models import DAY, Comment, Comment_Vote, Post, Vote
+from app.ratelimit import limiter
+
+POST, COMMENT = "post", "comment"
+RECORDS = {POST: Vote, COMMENT: Comment_Vote}
+KEYS = {POST: "post_id", COMMENT: "comment_id"}
+
+
+class VoteBuffer(object):
+    # accepted votes wait here, grouped per post and comment, until the
+    # flusher writes them; per process, so a worker that dies loses at
+    # most one interval of votes. Accepting a vote reads and writes
+    # nothing: votes cast before, and the daily vote limit, are checked
+    # for the whole batch when it is written, and the unique indexes on
+    # the vote tables still have the last word
+    def __init__(self, app=None):
+        self.pending = {}
+        # this worker's accepted votes per user since the last flush, so
+        # a burst can't queue more than a day's worth
+        self.hits = {}
+        self.lock = Lock()
+        self.thread = None
+        self.stopping = Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # the vote buttons post their token in a header
+        app.jinja_env.globals["csrf_token"] = generate_csrf
+        if not app.config["VOTES_FLUSH_INTERVAL"] or app.testing:
+            return
+
+        @app.before_first_request
+        def start_vote_flusher():
+            self.start(app)
+
+    def start(self, app):
+        if self.thread is not None:
+            return
+        self.thread = Thread(target=self.work, args=(app,), daemon=True)
+        self.thread.start()
+        atexit.register(self.stop, app)
+
+    def stop(self, app):
+        if self.thread is None:
+            return
+        self.stopping.set()
+        self.thread.join()
+        self.thread = None
+        self.stopping.clear()
+        with app.app_context():
+            self.flush()
+
+    def accept(self, kind, user_id, target_id):
+        with self.lock:
+            voters = self.pending.get((kind, target_id), set())
+            hits = self.hits.get(user_id, 0)
+            if user_id in voters:
+                return False
+            if hits >= current_app.config["USER_VOTES_PER_DAY"]:
+                return False
+            self.pending.setdefault((kind, target_id), voters).add(user_id)
+            self.hits[user_id] = hits + 1
+        # without a flusher running the vote is written straight away
+        if self.thread is None:
+            self.flush()
+        return True
+
+    def work(self, app):
+        interval = app.config["VOTES_FLUSH_INTERVAL"] / 1000
+        while not self.stopping.wait(interval):
+            with app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    app.logger.exception("Vote flush failed")
+                finally:
+                    db.session.remove()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            hits, self.hits = self.hits, {}
+        if not pending:
+            return 0
+        try:
+            counted = write(pending)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # put the batch back so the next flush retries it
+            with self.lock:
+                for key, voters in pending.items():
+                    self.pending.setdefault(key, set()).update(voters)
+                for user_id, count in hits.items():
+                    self.hits[user_id] = self.hits.get(user_id, 0) + count
+            raise
+        if counted[POST]:
+            from app.cache import cache
+
+            cache.invalidate()
+        return counted[POST] + counted[COMMENT]
+
+
+def has_voted(kind, user_id, target_id):
+    query = RECORDS[kind].query.filter_by(
+        user_id=user_id, **{KEYS[kind]: target_id}
+    )
+    return db.session.query(query.exists()).scalar()
+
+
+def write(pending):
+    # one transaction for the whole batch: a lookup per kind for votes cast
+    # before, each voter's rate limit spent at once, a vote row per voter
+    # and a single increment per post or comment for all of its new votes
+    ids = {POST: [], COMMENT: []}
+    for kind, target_id in pending:
+        ids[kind].append(target_id)
+    for kind, targets in ids.items():
+        if not targets:
+            continue
+        record, key = RECORDS[kind], getattr(RECORDS[kind], KEYS[kind])
+        voters = {
+            user_id
+            for (other, _), users in pending.items()
+            if other == kind
+            for user_id in users
+        }
+        for user_id, target_id in db.session.query(record.user_id, key).filter(
+            key.in_(targets), record.user_id.in_(voters)
+        ):
+            pending[kind, target_id].discard(user_id)
+
+    # the limit lives in the shared store, so this holds across workers
+    # unless that store is memory://
+    cast = {}
+    for target, voters in pending.items():
+        for user_id in voters:
+            cast.setdefault(user_id, []).append(target)
+    limit = current_app.config["USER_VOTES_PER_DAY"]
+    for user_id, targets in cast.items():
+        spent = limiter.spend("vote", user_id, DAY, len(targets))
+        allowed = max(0, limit - (spent - len(targets)))
+        for target in targets[allowed:]:
+            pending[target].discard(user_id)
+
+    posts = {
+        id for id, in db.session.query(Post.id).filter(Post.id.in_(ids[POST]))
+    }
+    comments = {
+        comment.id: comment
+        for comment in Comment.query.filter(Comment.id.in_(ids[COMMENT]))
+    }
+
+    counted = {POST: 0, COMMENT: 0}
+    for (kind, target_id), voters in pending.items():
+        if target_id not in (posts if kind == POST else comments):
+            continue
+        count = sum(
+            bool(RECORDS[kind].record(user_id, target_id))
+            for user_id in voters
+        )
+        if not count:
+            continue
+        if kind == POST:
+            Post.update_votes(target_id, count)
+        else:
+            comments[target_id].update_votes(count)
+        counted[kind] += count
+    return counted
+
+
+votes = VoteBuffer()
@@ -0,0 +1,142 @@
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+
+from sqlalchemy import event
+
+from config import Config
+
+
+class BenchmarkConfig(Config):
+    TESTING = True
+    SECRET_KEY = "benchmark"
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    WTF_CSRF_ENABLED = False
+
+
+def bench_app(database_uri=None, **overrides):
+    from app import create_app, db
+
+    config = type(
+        "Config",
+        (BenchmarkConfig,),
+        dict(overrides, SQLALCHEMY_DATABASE_URI=database_uri or "sqlite://"),
+    )
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@contextmanager
+def timer(results, name):
+    start = time.perf_counter()
+    yield
+    results[name] = time.perf_counter() - start
+
+
+def percentiles(samples):
+    # seconds in, milliseconds out
+    samples = sorted(samples)
+    if not samples:
+        return {}
+
+    def at(quantile):
+        return samples[min(len(samples) - 1, int(len(samples) * quantile))]
+
+    return {
+        "count": len(samples),
+        "mean_ms": sum(samples) / len(samples) * 1000,
+        "p50_ms": at(0.5) * 1000,
+        "p95_ms": at(0.95) * 1000,
+        "p99_ms": at(0.99) * 1000,
+        "max_ms": samples[-1] * 1000,
+    }
+
+
+def save_results(name, results, output=None):
+    # one JSON file per run, so runs before and after a change can be
+    # diffed or plotted
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        revision = None
+    now = datetime.utcnow()
+    if output is None:
+        directory = os.path.join(os.path.dirname(__file__), "results")
+        os.makedirs(directory, exist_ok=True)
+        output = os.path.join(directory, f"{name}-{now:%Y%m%d-%H%M%S}.json")
+    with open(output, "w") as f:
+        json.dump(
+            {
+                "benchmark": name,
+                "timestamp": now.isoformat(),
+                "revision": revision,
+                "python": platform.python_version(),
+                "results": results,
+            },
+            f,
+            indent=2,
+            default=str,
+        )
+    return output
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@contextmanager
+def assert_max_queries(engine, limit):
+    with count_queries(engine) as statements:
+        yield statements
+    assert len(statements) <= limit, (
+        f"{len(statements)} queries issued, expected at most {limit}:\n"
+        + "\n".join(statements)
+    )
+
+
+@contextmanager
+def count_transactions(engine):
+    # commits that wrote something; read-only transactions aren't counted
+    counts = {"commits": 0}
+    writes = ("INSERT", "UPDATE", "DELETE")
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith(writes):
+            conn.info["writing"] = True
+
+    def commit(conn):
+        if conn.info.pop("writing", False):
+            counts["commits"] += 1
+
+    def rollback(conn):
+        conn.info.pop("writing", None)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "commit", commit)
+    event.listen(engine, "rollback", rollback)
+    try:
+        yield counts
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        event.remove(engine, "commit", commit)
+        event.remove(engine, "rollback", rollback)
@@ -0,0 +1,283 @@
+"""Seeded synthetic population for the benchmarks.
+
+python -m benchmarks.data --scale 100k --database /tmp/devtuga.db
+"""
+
+from datetime import datetime, timedelta
+import argparse
+import collections
+import itertools
+import random
+
+from werkzeug.security import generate_password_hash
+
+from benchmarks import bench_app, timer
+
+# users, posts, comments; votes follow from these. Comment paths are
+# built from 6-digit ids, which is what caps the top scale.
+SCALES = {
+    "10k": (1000, 1000, 10000),
+    "100k": (10000, 10000, 100000),
+    "1m": (50000, 100000, 999999),
+}
+PASSWORD = "x"
+DOMAINS = 200
+MAX_DEPTH = 26
+BATCH = 10000
+
+
+def vocabulary(rng, size=5000):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < size:
+        words.add(
+            "".join(rng.choice(letters) for _ in range(rng.randint(2, 9)))
+        )
+    return sorted(words)
+
+
+def zipf(size):
+    # cumulative weights for rng.choices: a few items get most of the hits
+    return list(itertools.accumulate(1 / (rank + 1) for rank in range(size)))
+
+
+class Writer(object):
+    # batched executemany INSERTs; rows that reference another writer's
+    # table wait until that writer has flushed its pending rows
+    def __init__(self, db, table, after=None, batch=BATCH):
+        self.db = db
+        self.table = table
+        self.after = after
+        self.batch = batch
+        self.rows = []
+        self.count = 0
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if self.after is not None:
+            self.after.flush()
+        if self.rows:
+            self.db.session.execute(self.table.insert(), self.rows)
+            self.db.session.commit()
+            self.count += len(self.rows)
+            self.rows = []
+
+
+def generate(db, scale="10k", seed=42, now=None):
+    from app.models import (
+        Comment,
+        Comment_Vote,
+        Post,
+        Source,
+        User,
+        Vote,
+    )
+
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+    users, posts, comments = SCALES[scale]
+    words = vocabulary(rng)
+    word_weights = zipf(len(words))
+
+    def text(low, high, limit):
+        count = rng.randint(low, high)
+        return " ".join(rng.choices(words, cum_weights=word_weights, k=count))[
+            :limit
+        ]
+
+    def voters(active):
+        # heavy tailed: most items get a vote or two, a few get hundreds
+        count = min(active, int(rng.paretovariate(1.1)) - 1)
+        return rng.sample(range(1, active + 1), count) if count > 0 else []
+
+    # the last tenth of the users never post or vote, so benchmarks have
+    # fresh accounts to vote and submit with
+    lurkers = users // 10
+    active = users - lurkers
+    karma = [1] * (users + 1)
+
+    password_hash = generate_password_hash(PASSWORD, method="pbkdf2:sha256:1")
+    writer = Writer(db, User.__table__)
+    for id in range(1, users + 1):
+        writer.add(
+            {
+                "id": id,
+                "username": f"user{id}",
+                "email": f"user{id}@x.pt",
+                "password_hash": password_hash,
+                "karma": 1,
+                "timestamp": now - timedelta(days=rng.uniform(30, 365)),
+            }
+        )
+    writer.flush()
+
+    # popular posts collect most of the discussion
+    ranks = list(range(1, posts + 1))
+    rng.shuffle(ranks)
+    comment_posts = [
+        ranks[index]
+        for index in rng.choices(
+            range(posts), cum_weights=zipf(posts), k=comments
+        )
+    ]
+    comment_counts = collections.Counter(comment_posts)
+
+    domain_weights = zipf(DOMAINS)
+    post_times = sorted(
+        now - timedelta(seconds=rng.uniform(0, 30 * 86400))
+        for _ in range(posts)
+    )
+    post_rows, sources = [], {}
+    writer = Writer(db, Post.__table__)
+    votes = Writer(db, Vote.__table__, after=writer)
+    for id, timestamp in enumerate(post_times, 1):
+        author = rng.randint(1, active)
+        post_voters = voters(active)
+        for user_id in post_voters:
+            votes.add({"user_id": user_id, "post_id": id})
+        karma[author] += len(post_voters)
+        row = {
+            "id": id,
+            "title": text(2, 10, 80),
+            "url": None,
+            "url_base": None,
+            "text": None,
+            "text_html": None,
+            "timestamp": timestamp,
+            "user_id": author,
+            "score": len(post_voters),
+            "pop_score": Post.hot_score(len(post_voters), timestamp, now),
+            "ranked_at": now,
+            "deleted": 1 if rng.random() < 0.02 else 0,
+            "comment_count": comment_counts[id],
+        }
+        if rng.random() < 0.7:
+            domain = rng.choices(range(DOMAINS), cum_weights=domain_weights)
+            row["url_base"] = f"site{domain[0]}.pt"
+            row["url"] = f"https://{row['url_base']}/{id}"
+        else:
+            row["text"] = text(5, 50, 280)
+            row["text_html"] = f"<p>{row['text']}</p>"
+        post_rows.append(row)
+        writer.add(row)
+        if row["url_base"] and not row["deleted"]:
+            count, score, last = sources.get(row["url_base"], (0, 0, None))
+            sources[row["url_base"]] = (
+                count + 1,
+                score + row["score"],
+                timestamp,
+            )
+    votes.flush()
+
+    threads = [[] for _ in range(posts)]
+    writer = Writer(db, Comment.__table__)
+    comment_votes = Writer(db, Comment_Vote.__table__, after=writer)
+    for id, post_id in enumerate(comment_posts, 1):
+        post = post_rows[post_id - 1]
+        thread = threads[post["id"] - 1]
+        parent = None
+        if thread and rng.random() < 0.7:
+            # replies mostly land on the latest comments: long chains
+            parent = thread[-rng.randint(1, min(5, len(thread)))]
+            if parent[2] >= MAX_DEPTH:
+                parent = None
+        comment_voters = voters(active)
+        for user_id in comment_voters:
+            comment_votes.add({"user_id": user_id, "comment_id": id})
+        path = "{:06d}".format(id)
+        if parent is None:
+            depth, thread_score = 0, len(comment_voters)
+        else:
+            path = parent[1] + "." + path
+            depth, thread_score = parent[2] + 1, parent[3]
+        thread.append((id, path, depth, thread_score))
+
+        timestamp = post["timestamp"] + timedelta(
+            seconds=rng.uniform(0, (now - post["timestamp"]).total_seconds())
+        )
+        body = text(3, 60, 300)
+        writer.add(
+            {
+                "id": id,
+                "text": body,
+                "text_html": f"<p>{body}</p>",
+                "user_id": rng.randint(1, active),
+                "timestamp": timestamp,
+                "thread_timestamp": timestamp,
+                "path": path,
+                "parent_id": parent[0] if parent else None,
+                "post_id": post["id"],
+                "score": len(comment_voters),
+                "thread_score": thread_score,
+            }
+        )
+    comment_votes.flush()
+
+    writer = Writer(db, Source.__table__)
+    for url_base, (count, score, last) in sources.items():
+        writer.add(
+            {
+                "url_base": url_base,
+                "post_count": count,
+                "total_score": score,
+                "last_post_at": last,
+            }
+        )
+    writer.flush()
+    db.session.execute(
+        User.__table__.update()
+        .where(User.id == db.bindparam("user_id"))
+        .values(karma=db.bindparam("karma")),
+        [
+            {"user_id": id, "karma": value}
+            for id, value in enumerate(karma)
+            if id and value != 1
+        ],
+    )
+    db.session.commit()
+
+    hot = max(
+        post_rows, key=lambda row: (not row["deleted"], row["comment_count"])
+    )
+    return {
+        "scale": scale,
+        "users": users,
+        "posts": posts,
+        "comments": comments,
+        "votes": votes.count,
+        "comment_votes": comment_votes.count,
+        "lurkers": [f"user{id}" for id in range(active + 1, users + 1)],
+        "hot_post": hot["id"],
+        "hot_comment": threads[hot["id"] - 1][0][0],
+        "max_depth": max(
+            depth for thread in threads for _, _, depth, _ in thread
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", default="10k", choices=SCALES)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database", help="SQLAlchemy URI, default memory")
+    args = parser.parse_args()
+
+    app = bench_app(args.database)
+    from app import db
+
+    results = {}
+    with app.app_context():
+        with timer(results, "generate"):
+            population = generate(db, args.scale, args.seed)
+    for name in ("users", "posts", "comments", "votes", "comment_votes"):
+        print(f"{name:>14}: {population[name]}")
+    print(f"{'max depth':>14}: {population['max_depth']}")
+    print(f"{'generated in':>14}: {results['generate']:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Concurrent mixed traffic against generated data.
+
+python -m benchmarks.load --scale 100k --threads 16 --duration 30
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks import bench_app, percentiles, save_results
+from benchmarks.data import SCALES, generate
+from benchmarks.routes import login
+
+# roughly what a link aggregator sees: mostly listings and threads
+MIX = (
+    ("index", 40),
+    ("new", 15),
+    ("post_page", 30),
+    ("upvote", 10),
+    ("upvote_comment", 5),
+)
+
+
+def worker(app, username, population, deadline, seed):
+    rng = random.Random(seed)
+    client = login(app, username)
+    names = [name for name, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    posts = population["posts"]
+    comments = population["comments"]
+    latencies = {name: [] for name in names}
+    errors = 0
+
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        if name == "index":
+            url = "/"
+        elif name == "new":
+            url = "/newest"
+        elif name == "post_page":
+            # half the thread views go to the biggest discussion
+            post = population["hot_post"]
+            if rng.random() < 0.5:
+                post = rng.randint(1, posts)
+            url = f"/post/{post}"
+        elif name == "upvote":
+            url = f"/upvote/{rng.randint(1, posts)}"
+        else:
+            url = f"/upvote_comment/{rng.randint(1, comments)}"
+        start = time.perf_counter()
+        response = client.get(url)
+        latencies[name].append(time.perf_counter() - start)
+        if response.status_code not in (200, 302, 404):
+            errors += 1
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", default="10k", choices=SCALES)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--cache", default="memory", help="CACHE_TYPE")
+    parser.add_argument("--output", help="JSON file, default results/")
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    app = bench_app(
+        "sqlite:///" + path,
+        CACHE_TYPE=args.cache,
+        SQLALCHEMY_ENGINE_OPTIONS={"connect_args": {"timeout": 30}},
+    )
+    from app import db
+
+    with app.app_context():
+        population = generate(db, args.scale)
+    usernames = population["lurkers"][: args.threads]
+    assert len(usernames) == args.threads, "not enough accounts"
+
+    deadline = time.perf_counter() + args.duration
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        futures = [
+            pool.submit(worker, app, username, population, deadline, seed)
+            for seed, username in enumerate(usernames)
+        ]
+        outcomes = [future.result() for future in futures]
+    elapsed = args.duration + max(0, time.perf_counter() - deadline)
+    os.remove(path)
+
+    merged = {name: [] for name, _ in MIX}
+    errors = 0
+    for latencies, worker_errors in outcomes:
+        errors += worker_errors
+        for name, samples in latencies.items():
+            merged[name].extend(samples)
+    total = sum(len(samples) for samples in merged.values())
+
+    results = {
+        "scale": args.scale,
+        "threads": args.threads,
+        "duration_seconds": elapsed,
+        "requests": total,
+        "requests_per_second": total / elapsed,
+        "errors": errors,
+        "all": percentiles(
+            [sample for samples in merged.values() for sample in samples]
+        ),
+    }
+    results.update(
+        (name, percentiles(samples)) for name, samples in merged.items()
+    )
+
+    print(f"scale: {args.scale} threads: {args.threads}")
+    print(
+        f"{total} requests in {elapsed:.1f} s: "
+        f"{results['requests_per_second']:.1f} req/s, {errors} errors"
+    )
+    for name in ["all"] + [name for name, _ in MIX]:
+        stats = results[name]
+        if stats:
+            print(
+                f"{name:>15}: p50 {stats['p50_ms']:8.2f} ms"
+                f"  p99 {stats['p99_ms']:8.2f} ms"
+            )
+    print("results:", save_results("load", results, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""HTML size and server time of a long comment thread.
+
+python -m benchmarks.page_weight --comments 500 --repeat 50
+
+Pages aren't streamed, so the time to the whole response through the test
+client is also the time to its first byte.
+"""
+
+from datetime import datetime, timedelta
+import argparse
+import gzip
+import time
+
+from werkzeug.security import generate_password_hash
+
+from benchmarks import bench_app, percentiles, save_results
+
+
+def seed(db, comments):
+    from app.models import Comment, Post, User
+
+    now = datetime.utcnow()
+    db.session.add(
+        User(
+            username="author",
+            email="author@x.pt",
+            karma=1,
+            password_hash=generate_password_hash(
+                "x", method="pbkdf2:sha256:1"
+            ),
+        )
+    )
+    db.session.add(
+        Post(
+            title="discussion",
+            text="long thread",
+            user_id=1,
+            score=1,
+            deleted=0,
+            timestamp=now - timedelta(days=2),
+            comment_count=comments,
+        )
+    )
+    rows, paths = [], {}
+    for id in range(1, comments + 1):
+        # a new thread every fifth comment, replies chain under it
+        parent = None if id % 5 == 1 else id - 1
+        paths[id] = (paths[parent] + "." if parent else "") + f"{id:06d}"
+        text = f"comentário número {id} " * 4
+        rows.append(
+            {
+                "id": id,
+                "text": text,
+                "text_html": f"<p>{text}</p>",
+                "user_id": 1,
+                "post_id": 1,
+                "parent_id": parent,
+                "path": paths[id],
+                "timestamp": now - timedelta(minutes=comments - id),
+                "thread_timestamp": now,
+                "score": 0,
+                "thread_score": 0,
+            }
+        )
+    db.session.commit()
+    db.session.execute(Comment.__table__.insert(), rows)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--comments", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", help="JSON file, default results/")
+    args = parser.parse_args()
+
+    app = bench_app(
+        COMMENT_THREADS_PER_PAGE=args.comments,
+        COMMENTS_MAX_DEPTH=args.comments,
+    )
+    from app import db
+
+    with app.app_context():
+        seed(db, args.comments)
+    client = app.test_client()
+
+    latencies = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        response = client.get("/post/1")
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+    body = response.data
+    results = {
+        "comments": args.comments,
+        "html_bytes": len(body),
+        "html_gzip_bytes": len(gzip.compress(body)),
+        "scripts": body.count(b"<script"),
+        "ttfb": percentiles(latencies),
+    }
+
+    print(f"/post/1 with {args.comments} comments")
+    print(
+        f"html: {results['html_bytes']} bytes "
+        f"({results['html_gzip_bytes']} gzipped), "
+        f"{results['scripts']} script elements"
+    )
+    print(
+        f"ttfb: p50 {results['ttfb']['p50_ms']:.1f} ms"
+        f"  p99 {results['ttfb']['p99_ms']:.1f} ms"
+    )
+    print("results:", save_results("page_weight", results, args.output))
+
+
+if __name__ == "__main__":
+    main()
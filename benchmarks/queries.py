@@ -0,0 +1,87 @@
+"""Query budgets for the listing pages, to catch N+1 regressions.
+
+python -m benchmarks.queries --comments 200
+"""
+
+from datetime import datetime, timedelta
+import argparse
+
+from benchmarks import assert_max_queries, bench_app
+
+# every listing should cost a constant number of queries, whatever the
+# number of rows it renders
+BUDGETS = {
+    "/": 3,
+    "/newest": 3,
+    "/source/example.com": 3,
+    "/sources": 1,
+    "/submissions/user0": 4,
+    "/post/1": 3,
+}
+
+
+def seed(db, User, Post, Source, Comment, users, comments):
+    now = datetime.utcnow()
+    authors = [
+        User(username=f"user{i}", email=f"user{i}@x.pt") for i in range(users)
+    ]
+    db.session.add_all(authors)
+    db.session.flush()
+    posts = [
+        Post(
+            title=f"post {i}",
+            url=f"https://example.com/{i}",
+            url_base="example.com",
+            author=authors[i % users],
+            timestamp=now - timedelta(minutes=i),
+            score=i,
+            deleted=0,
+        )
+        for i in range(users)
+    ]
+    db.session.add_all(posts)
+    for post in posts:
+        Source.add_post(post)
+    db.session.commit()
+    parent = None
+    for i in range(comments):
+        comment = Comment(
+            text=f"comment {i}",
+            author=authors[i % users],
+            post_id=posts[0].id,
+            parent_id=parent.id if parent is not None and i % 3 else None,
+            timestamp=now,
+            thread_timestamp=now,
+        )
+        comment.save()
+        parent = comment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--comments", type=int, default=200)
+    args = parser.parse_args()
+
+    app = bench_app()
+    from app import db
+    from app.models import Comment, Post, Source, User
+
+    with app.app_context():
+        seed(db, User, Post, Source, Comment, args.users, args.comments)
+        from app.ranking import refresh_rankings
+
+        refresh_rankings()
+        engine = db.engine
+    client = app.test_client()
+
+    for url, budget in BUDGETS.items():
+        with app.app_context():
+            with assert_max_queries(engine, budget) as statements:
+                response = client.get(url)
+        assert response.status_code == 200, url
+        print(f"{url:>24}: {len(statements):3d} queries (budget {budget})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Per-object pop_score loop vs the bulk ranking refresh.
+
+python -m benchmarks.ranking --posts 2000
+"""
+
+from datetime import datetime, timedelta
+import argparse
+import random
+
+from benchmarks import bench_app, timer
+
+
+def seed(db, Post, posts, window_hours):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    db.session.bulk_insert_mappings(
+        Post,
+        [
+            {
+                "title": f"post {i}",
+                "score": rng.randint(0, 200),
+                "deleted": 0,
+                "timestamp": now
+                - timedelta(minutes=rng.randint(0, window_hours * 60 - 5)),
+            }
+            for i in range(posts)
+        ],
+    )
+    db.session.commit()
+
+
+def per_object(db, Post):
+    # what update_renderings() used to do on every page view
+    for post in Post.query.filter_by(deleted=0).all():
+        post.update()
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--posts", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = bench_app(RANKING_REFRESH_INTERVAL=0)
+    from app import db
+    from app.models import Post
+    from app.ranking import refresh_rankings
+
+    results = {}
+    with app.app_context():
+        seed(db, Post, args.posts, app.config["RANKING_WINDOW_HOURS"])
+        with timer(results, "per_object"):
+            per_object(db, Post)
+        with timer(results, "bulk"):
+            ranked = refresh_rankings()
+        assert ranked == args.posts
+
+    print(f"posts: {args.posts}")
+    for name, seconds in results.items():
+        print(f"{name:>12}: {seconds * 1000:10.1f} ms")
+    print(f"{'speedup':>12}: {results['per_object'] / results['bulk']:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
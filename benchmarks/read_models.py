@@ -0,0 +1,147 @@
+"""Memory and CPU per listing render, ORM objects against the column rows
+of app/read_models.py, on generated data.
+
+python -m benchmarks.read_models --scale 100k --repeat 50
+"""
+
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from benchmarks import bench_app, save_results
+from benchmarks.data import SCALES, generate
+
+THREAD = (
+    "{% for node in comments %}{% set comment = node.comment %}"
+    "{% include '_comment.html' %}{% endfor %}"
+)
+
+
+def listings(db, config, hot_post):
+    from flask import render_template_string
+
+    from app.comment_tree import CommentTree
+    from app.main.routes import render_listing
+    from app.models import Comment, Post
+    from app.ranking import front_page
+    from app.read_models import CommentRow, PostRow
+
+    per_page = config["POSTS_PER_PAGE"]
+
+    def newest(query):
+        return query.order_by(Post.timestamp.desc(), Post.id.desc()).limit(
+            per_page + 1
+        )
+
+    def thread(comments):
+        tree = CommentTree(comments)
+        return render_template_string(
+            THREAD, comments=tree.flatten(tree.roots)
+        )
+
+    return {
+        "index": (
+            lambda: render_listing(
+                front_page().paginate(1, per_page, True).items, 1
+            ),
+            lambda: render_listing(
+                PostRow.wrap(
+                    front_page(PostRow.query())
+                    .paginate(1, per_page, True)
+                    .items
+                ),
+                1,
+            ),
+        ),
+        "newest": (
+            lambda: render_listing(
+                newest(
+                    Post.query.filter_by(deleted=0).options(
+                        db.joinedload(Post.author)
+                    )
+                ).all(),
+                1,
+            ),
+            lambda: render_listing(
+                PostRow.wrap(
+                    newest(PostRow.query().filter(Post.deleted == 0))
+                ),
+                1,
+            ),
+        ),
+        "post_thread": (
+            lambda: thread(
+                Comment.query.filter_by(post_id=hot_post)
+                .options(db.joinedload(Comment.author))
+                .order_by(Comment.path)
+                .all()
+            ),
+            lambda: thread(
+                CommentRow.wrap(
+                    CommentRow.query()
+                    .filter(Comment.post_id == hot_post)
+                    .order_by(Comment.path)
+                )
+            ),
+        ),
+    }
+
+
+def measure(db, render, repeat):
+    # CPU and memory in separate passes: tracing allocations slows
+    # everything down. The session is dropped after each render, as at the
+    # end of a request, so the identity map is paid for every time
+    cpu = []
+    for _ in range(repeat):
+        start = time.process_time()
+        render()
+        db.session.remove()
+        cpu.append(time.process_time() - start)
+    peaks = []
+    for _ in range(repeat):
+        tracemalloc.start()
+        render()
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        db.session.remove()
+    return {
+        "cpu_ms": statistics.median(cpu) * 1000,
+        "peak_kb": statistics.median(peaks) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", default="10k", choices=SCALES)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--output", help="JSON file, default results/")
+    args = parser.parse_args()
+
+    app = bench_app(CACHE_TYPE="none")
+    from app import db
+
+    with app.app_context():
+        population = generate(db, args.scale)
+    results = {}
+    with app.test_request_context("/"):
+        for name, (orm, rows) in listings(
+            db, app.config, population["hot_post"]
+        ).items():
+            results[name] = {
+                "orm": measure(db, orm, args.repeat),
+                "rows": measure(db, rows, args.repeat),
+            }
+
+    print(f"scale: {args.scale} repeat: {args.repeat}")
+    for name, paths in results.items():
+        orm, rows = paths["orm"], paths["rows"]
+        print(
+            f"{name:>12}: cpu {orm['cpu_ms']:7.2f} -> {rows['cpu_ms']:7.2f} ms"
+            f"  peak {orm['peak_kb']:8.1f} -> {rows['peak_kb']:8.1f} KB"
+        )
+    print("results:", save_results("read_models", results, args.output))
+
+
+if __name__ == "__main__":
+    main()
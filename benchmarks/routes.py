@@ -0,0 +1,103 @@
+"""Latency of the hot routes through the test client, on generated data.
+
+python -m benchmarks.routes --scale 100k --repeat 200
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks import bench_app, percentiles, save_results, timer
+from benchmarks.data import PASSWORD, SCALES, generate
+
+
+def login(app, username):
+    client = app.test_client()
+    response = client.post(
+        "/auth/login", data={"username": username, "password": PASSWORD}
+    )
+    assert response.status_code == 302, username
+    return client
+
+
+def measure(clients, send, repeat):
+    latencies = []
+    for i in range(repeat):
+        client = clients[i % len(clients)]
+        start = time.perf_counter()
+        response = send(client, i)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code in (200, 302), response.status_code
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", default="10k", choices=SCALES)
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--cache", default="memory", help="CACHE_TYPE")
+    parser.add_argument("--output", help="JSON file, default results/")
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    app = bench_app(
+        "sqlite:///" + path,
+        CACHE_TYPE=args.cache,
+        RATELIMIT_STORAGE_URL="memory://",
+    )
+    from app import db
+
+    results = {}
+    with app.app_context():
+        with timer(results, "generate_seconds"):
+            population = generate(db, args.scale)
+
+    # every write comes from an account that hasn't voted or posted yet,
+    # so each request takes the full write path
+    lurkers = population["lurkers"]
+    voters = [login(app, username) for username in lurkers[: args.repeat]]
+    reader = [voters[0]]
+
+    post, comment = population["hot_post"], population["hot_comment"]
+    hot_routes = {
+        "index": (reader, lambda client, i: client.get("/")),
+        "new": (reader, lambda client, i: client.get("/newest")),
+        "post_page": (reader, lambda client, i: client.get(f"/post/{post}")),
+        "upvote": (voters, lambda client, i: client.get(f"/upvote/{post}")),
+        "upvote_comment": (
+            voters,
+            lambda client, i: client.get(f"/upvote_comment/{comment}"),
+        ),
+        "submit": (
+            voters,
+            lambda client, i: client.post(
+                "/submit",
+                data={
+                    "title": f"benchmark {i}",
+                    "url": f"https://benchmark.pt/{i}",
+                    "text": "",
+                },
+            ),
+        ),
+    }
+    for name, (clients, send) in hot_routes.items():
+        results[name] = percentiles(measure(clients, send, args.repeat))
+
+    os.remove(path)
+    results["population"] = {
+        key: value for key, value in population.items() if key != "lurkers"
+    }
+    print(f"scale: {args.scale} repeat: {args.repeat} cache: {args.cache}")
+    for name in hot_routes:
+        stats = results[name]
+        print(
+            f"{name:>15}: p50 {stats['p50_ms']:8.2f} ms"
+            f"  p99 {stats['p99_ms']:8.2f} ms"
+        )
+    print("results:", save_results("routes", results, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Search query latency over a large comment corpus.
+
+python -m benchmarks.search --comments 1000000 --backend fts5
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks import bench_app, percentiles, save_results, timer
+from benchmarks.data import vocabulary, zipf
+
+WORDS = 20000
+
+
+def seed(db, Post, Comment, comments, words, rng):
+    # zipf-ish word frequencies, like real text: a few words everywhere,
+    # most of them rare. The post is older than every comment, and its
+    # title has the commonest word
+    db.session.execute(
+        Post.__table__.insert(),
+        {"id": 1, "title": f"{words[0]} tips", "score": 0, "deleted": 0},
+    )
+    weights = zipf(len(words))
+    batch = 10000
+    for start in range(0, comments, batch):
+        size = min(batch, comments - start)
+        db.session.execute(
+            Comment.__table__.insert(),
+            [
+                {
+                    "text": " ".join(
+                        rng.choices(
+                            words, cum_weights=weights, k=rng.randint(5, 40)
+                        )
+                    ),
+                    "post_id": 1,
+                    "score": 0,
+                }
+                for _ in range(size)
+            ],
+        )
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--comments", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--backend", default="fts5", choices=("fts5", "terms"))
+    parser.add_argument("--output", help="JSON file, default results/")
+    args = parser.parse_args()
+
+    app = bench_app(SEARCH_BACKEND=args.backend)
+    from app import db
+    from app.models import Comment, Post
+    from app.search import POST, search_index
+
+    rng = random.Random(42)
+    words = vocabulary(rng, WORDS)
+    results = {}
+    with app.app_context():
+        with timer(results, "seed"):
+            seed(db, Post, Comment, args.comments, words, rng)
+        with timer(results, "reindex"):
+            search_index.reindex(batch=10000)
+        hits = search_index.search(words[0], app.config["SEARCH_RESULTS"])
+        assert (POST, 1) in hits, "post buried under newer comments"
+
+        latencies = []
+        for _ in range(args.queries):
+            # one to three of the commonest words: the expensive queries
+            query = " ".join(rng.sample(words[:2000], rng.randint(1, 3)))
+            start = time.perf_counter()
+            search_index.search(query, app.config["SEARCH_RESULTS"])
+            latencies.append(time.perf_counter() - start)
+    results["queries"] = percentiles(latencies)
+
+    print(f"comments: {args.comments} backend: {args.backend}")
+    for name in ("seed", "reindex"):
+        print(f"{name:>8}: {results[name]:10.1f} s")
+    for name in ("p50", "p99", "max"):
+        print(f"{name:>8}: {results['queries'][name + '_ms']:10.2f} ms")
+    results.update(comments=args.comments, backend=args.backend)
+    print("results:", save_results("search", results, args.output))
+
+
+if __name__ == "__main__":
+    main()
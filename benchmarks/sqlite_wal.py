@@ -0,0 +1,185 @@
+"""Read throughput on SQLite while other workers write, with the default
+rollback journal and with the WAL profile from Config.SQLITE_PRAGMAS.
+
+python -m benchmarks.sqlite_wal --readers 3 --writers 2 --duration 10
+
+Every worker is its own process, like gunicorn's; each writer process runs
+several threads voting through the synchronous upvote links.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from benchmarks import bench_app, percentiles, save_results
+from benchmarks.data import generate
+from benchmarks.routes import login
+
+PROFILES = {
+    "rollback journal": {
+        "SQLITE_PRAGMAS": {},
+        "SQLITE_SERIALIZE_WRITES": False,
+    },
+    "wal": {},
+}
+
+
+def worker_app(path, profile):
+    return bench_app(
+        "sqlite:///" + path,
+        CACHE_TYPE="none",
+        RATELIMIT_STORAGE_URL="memory://",
+        **PROFILES[profile],
+    )
+
+
+def wait(start):
+    time.sleep(max(0, start - time.perf_counter()))
+
+
+def read(path, profile, population, start, deadline, seed):
+    rng = random.Random(seed)
+    client = worker_app(path, profile).test_client()
+    wait(start)
+    latencies, errors = [], 0
+    while time.perf_counter() < deadline:
+        url = rng.choice(
+            ["/", "/newest", f"/post/{rng.randint(1, population['posts'])}"]
+        )
+        started = time.perf_counter()
+        try:
+            response = client.get(url)
+            if response.status_code == 500:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            errors += 1
+    return latencies, errors
+
+
+def write(path, profile, population, usernames, start, deadline, seed):
+    app = worker_app(path, profile)
+
+    def vote(username, seed):
+        rng = random.Random(seed)
+        client = login(app, username)
+        wait(start)
+        done = errors = 0
+        while time.perf_counter() < deadline:
+            url = f"/upvote/{rng.randint(1, population['posts'])}"
+            try:
+                response = client.get(url)
+                if response.status_code == 500:
+                    errors += 1
+                else:
+                    done += 1
+            except OperationalError:
+                errors += 1
+        return done, errors
+
+    with ThreadPoolExecutor(max_workers=len(usernames)) as pool:
+        outcomes = list(
+            pool.map(
+                vote,
+                usernames,
+                range(seed, seed + len(usernames)),
+            )
+        )
+    return tuple(map(sum, zip(*outcomes)))
+
+
+def run(profile, args):
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    app = worker_app(path, profile)
+    from app import db
+
+    with app.app_context():
+        population = generate(db, args.scale)
+        journal = db.session.execute("PRAGMA journal_mode").scalar()
+        db.session.remove()
+        db.engine.dispose()
+    lurkers = population["lurkers"]
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(args.readers + args.writers) as pool:
+        # the monotonic clock is shared between processes; workers get a
+        # few seconds to import and build their app before the start
+        start = time.perf_counter() + 5
+        deadline = start + args.duration
+        reads = [
+            pool.apply_async(
+                read, (path, profile, population, start, deadline, seed)
+            )
+            for seed in range(args.readers)
+        ]
+        writes = [
+            pool.apply_async(
+                write,
+                (
+                    path,
+                    profile,
+                    population,
+                    lurkers[
+                        number * args.threads : (number + 1) * args.threads
+                    ],
+                    start,
+                    deadline,
+                    1000 * (number + 1),
+                ),
+            )
+            for number in range(args.writers)
+        ]
+        reads = [result.get() for result in reads]
+        writes = [result.get() for result in writes]
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    latencies = [sample for samples, _ in reads for sample in samples]
+    writes_done, write_errors = map(sum, zip(*writes))
+    return {
+        "journal_mode": journal,
+        "reads_per_second": len(latencies) / args.duration,
+        "read_errors": sum(errors for _, errors in reads),
+        "read_latency": percentiles(latencies),
+        "writes_per_second": writes_done / args.duration,
+        "write_errors": write_errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scale", default="10k")
+    parser.add_argument("--readers", type=int, default=3)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--output", help="JSON file, default results/")
+    args = parser.parse_args()
+
+    results = {profile: run(profile, args) for profile in PROFILES}
+    print(
+        f"{args.readers} readers, {args.writers} writers x {args.threads} "
+        f"threads, {args.duration:.0f} s"
+    )
+    for profile, stats in results.items():
+        print(
+            f"{profile:>17}: {stats['reads_per_second']:7.1f} reads/s "
+            f"({stats['read_errors']} errors, "
+            f"p99 {stats['read_latency']['p99_ms']:.0f} ms)  "
+            f"{stats['writes_per_second']:7.1f} writes/s "
+            f"({stats['write_errors']} errors)"
+        )
+    print("results:", save_results("sqlite_wal", results, args.output))
+
+
+if __name__ == "__main__":
+    main()
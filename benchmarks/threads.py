@@ -0,0 +1,91 @@
+"""Upvoting the root of a big thread: per-row commits vs one UPDATE.
+
+python -m benchmarks.threads --depth 6 --width 4
+"""
+
+from datetime import datetime
+import argparse
+
+from benchmarks import bench_app, count_queries, timer
+
+
+def build_thread(db, Comment, post_id, depth, width):
+    # `width` replies under every comment, `depth` levels deep
+    now = datetime.utcnow()
+    root = Comment(text="root", post_id=post_id, timestamp=now, score=0)
+    root.save()
+    level = [root]
+    for _ in range(depth - 1):
+        children = []
+        for parent in level:
+            for _ in range(width):
+                children.append(
+                    Comment(
+                        text="reply",
+                        post_id=post_id,
+                        parent_id=parent.id,
+                        timestamp=now,
+                        score=0,
+                    )
+                )
+        db.session.add_all(children)
+        db.session.flush()
+        for child in children:
+            child.path = child.parent.path + ".{:0{}d}".format(
+                child.id, Comment._N
+            )
+        db.session.commit()
+        level = children
+    return root
+
+
+def per_row(db, Comment, root):
+    # Comment.update_votes() before it became a single UPDATE
+    root.score += 1
+    root.thread_score = root.score
+    for child_comment in Comment.query.filter(
+        Comment.path.like(root.path + "%")
+    ):
+        child_comment.thread_score = root.thread_score
+        db.session.commit()
+
+
+def set_based(db, Comment, root):
+    root.update_votes()
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--width", type=int, default=4)
+    args = parser.parse_args()
+
+    app = bench_app()
+    from app import db
+    from app.models import Comment, Post
+
+    results, queries = {}, {}
+    with app.app_context():
+        post = Post(title="thread", score=0, deleted=0)
+        db.session.add(post)
+        db.session.commit()
+        root = build_thread(db, Comment, post.id, args.depth, args.width)
+        size = Comment.query.count()
+
+        for name, vote in (("per_row", per_row), ("set_based", set_based)):
+            with count_queries(db.engine) as statements:
+                with timer(results, name):
+                    vote(db, Comment, root)
+            queries[name] = len(statements)
+            assert {c.thread_score for c in Comment.query} == {root.score}
+
+    print(f"comments: {size} (depth {args.depth}, width {args.width})")
+    for name, seconds in results.items():
+        print(
+            f"{name:>10}: {seconds * 1000:10.1f} ms {queries[name]:6d} queries"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Many users hammering the upvote links of one post and one comment.
+
+python -m benchmarks.votes --users 50 --clicks 5 [--buffered]
+
+--buffered sends the votes to the POST endpoints, which queue them for the
+write-behind flusher, instead of the synchronous GET links.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import argparse
+import os
+import tempfile
+
+from werkzeug.security import generate_password_hash
+
+from benchmarks import bench_app, count_transactions, timer
+
+
+def seed(db, User, Post, Comment, users):
+    now = datetime.utcnow()
+    # a single hash round keeps logging in 50 users cheap
+    password_hash = generate_password_hash("x", method="pbkdf2:sha256:1")
+    voters = [
+        User(
+            username=f"user{i}",
+            email=f"user{i}@x.pt",
+            karma=1,
+            password_hash=password_hash,
+        )
+        for i in range(users)
+    ]
+    db.session.add_all(voters)
+    post = Post(title="hot", author=voters[0], score=0, deleted=0)
+    db.session.add(post)
+    db.session.commit()
+    comment = Comment(
+        text="hot take", author=voters[0], post_id=post.id, timestamp=now
+    )
+    comment.save()
+    return [user.username for user in voters], post.id, comment.id
+
+
+def clicker(app, username, urls, clicks, buffered):
+    client = app.test_client()
+    client.post("/auth/login", data={"username": username, "password": "x"})
+    for _ in range(clicks):
+        for url in urls:
+            if buffered:
+                response = client.post(url)
+                assert response.status_code == 202, response.status_code
+            else:
+                response = client.get(url)
+                assert response.status_code == 302, response.status_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--clicks", type=int, default=5)
+    parser.add_argument("--buffered", action="store_true")
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    app = bench_app(
+        "sqlite:///" + path,
+        VOTES_FLUSH_INTERVAL=50,
+        SQLALCHEMY_ENGINE_OPTIONS={"connect_args": {"timeout": 30}},
+    )
+    from app import db
+    from app.models import Comment, Comment_Vote, Post, User, Vote
+    from app.votes import votes
+
+    with app.app_context():
+        usernames, post_id, comment_id = seed(
+            db, User, Post, Comment, args.users
+        )
+    if args.buffered:
+        urls = [f"/vote/post/{post_id}", f"/vote/comment/{comment_id}"]
+        # bench apps run in testing mode, which doesn't start the flusher
+        votes.start(app)
+    else:
+        urls = [f"/upvote/{post_id}", f"/upvote_comment/{comment_id}"]
+
+    results = {}
+    with app.app_context():
+        engine = db.engine
+    with count_transactions(engine) as transactions:
+        with timer(results, "elapsed"):
+            with ThreadPoolExecutor(max_workers=args.users) as pool:
+                for future in [
+                    pool.submit(
+                        clicker,
+                        app,
+                        username,
+                        urls,
+                        args.clicks,
+                        args.buffered,
+                    )
+                    for username in usernames
+                ]:
+                    future.result()
+        votes.stop(app)
+
+    with app.app_context():
+        post = Post.query.get(post_id)
+        comment = Comment.query.get(comment_id)
+        checks = {
+            "post score": (post.score, args.users),
+            "post votes": (Vote.query.count(), args.users),
+            "author karma": (post.author.karma, 1 + args.users),
+            "comment score": (comment.score, args.users),
+            "comment votes": (Comment_Vote.query.count(), args.users),
+            "thread score": (comment.thread_score, args.users),
+        }
+    os.remove(path)
+
+    clicks = args.users * args.clicks * len(urls)
+    print(
+        f"{clicks} clicks from {args.users} users in "
+        f"{results['elapsed']:.2f}s, "
+        f"{transactions['commits']} write transactions"
+    )
+    for name, (got, expected) in checks.items():
+        print(f"{name:>14}: {got} (expected {expected})")
+    assert all(got == expected for got, expected in checks.values())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 #!/bin/sh
 source venv/bin/activate
 flask db upgrade
+flask assets build
 exec gunicorn -b :5000 --access-logfile - --error-logfile - dev:app -w 4
\ No newline at end of file
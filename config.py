@@ -11,13 +11,93 @@ class Config(object):
         "DATABASE_URL"
     ) or "sqlite:///" + os.path.join(basedir, "app.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # comma separated; read-only views read from these
+    DATABASE_REPLICA_URLS = [
+        url
+        for url in (os.environ.get("DATABASE_REPLICA_URLS") or "").split(",")
+        if url
+    ]
+    # seconds a user keeps reading from the primary after a write
+    DATABASE_STICKY_SECONDS = 5
+    # primary and replicas alike; not applied to SQLite
+    DATABASE_POOL_OPTIONS = {
+        "pool_size": int(os.environ.get("DATABASE_POOL_SIZE") or 10),
+        "max_overflow": int(os.environ.get("DATABASE_MAX_OVERFLOW") or 10),
+        "pool_timeout": 10,
+        # below MySQL's wait_timeout, so idle connections aren't dropped
+        # under us; pre_ping catches the ones that are anyway
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+    }
+    # set on every new SQLite connection. WAL lets reads carry on while a
+    # write commits; NORMAL only syncs at checkpoints, which in WAL mode
+    # can lose the last commits on power loss but never corrupts
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+    }
+    # one write transaction at a time per worker and database file
+    SQLITE_SERIALIZE_WRITES = True
+    # a SQLite file keeps its connections between requests too, so the
+    # PRAGMAs above run once per connection and its page cache survives
+    SQLITE_POOL_OPTIONS = {
+        "pool_size": int(os.environ.get("SQLITE_POOL_SIZE") or 5),
+        "max_overflow": 10,
+        "pool_timeout": 10,
+    }
     MAIL_ADMIN_ADDRESS = os.environ.get("MAIL_ADMIN_ADDRESS")
     MAIL_SERVER = os.environ.get("MAIL_SERVER")
     MAIL_PORT = int(os.environ.get("MAIL_PORT") or 25)
     MAIL_USE_TLS = os.environ.get("MAIL_USE_TLS") is not None
     MAIL_USERNAME = os.environ.get("MAIL_USERNAME")
     MAIL_PASSWORD = os.environ.get("MAIL_PASSWORD")
+    JOBS_WORKERS = int(os.environ.get("JOBS_WORKERS") or 2)
+    JOBS_BATCH_SIZE = 50
+    JOBS_MAX_ATTEMPTS = 5
+    JOBS_RETRY_DELAY = 30
+    JOBS_LOCK_TIMEOUT = 600
+    JOBS_POLL_INTERVAL = 5
     POSTS_PER_PAGE = 20
     TOTAL_POSTS = 30
+    TOP_SOURCES = 30
+    COMMENT_THREADS_PER_PAGE = 50
+    COMMENTS_MAX_DEPTH = 10
+    RANKING_GRAVITY = 1.8
+    RANKING_REFRESH_INTERVAL = int(
+        os.environ.get("RANKING_REFRESH_INTERVAL") or 60
+    )
+    RANKING_WINDOW_HOURS = 72
     USER_POSTS_PER_DAY = 2
     USER_COMMENTS_PER_DAY = 15
+    USER_VOTES_PER_DAY = 500
+    # milliseconds between vote flushes; 0 writes each vote as it arrives
+    VOTES_FLUSH_INTERVAL = int(os.environ.get("VOTES_FLUSH_INTERVAL") or 250)
+    REGISTRATIONS_PER_DAY = 5
+    # proxies in front of the app trusted for X-Forwarded-For; registrations
+    # are limited per client address, which is the proxy's without this
+    PROXY_FIX_X_FOR = int(os.environ.get("PROXY_FIX_X_FOR") or 0)
+    # sql:// (default), memory:// or redis://host:port/db; memory:// counts
+    # per worker, so each gunicorn worker allows the full limits
+    RATELIMIT_STORAGE_URL = os.environ.get("RATELIMIT_STORAGE_URL") or "sql://"
+    # memory (per worker), redis (shared between workers) or none
+    CACHE_TYPE = os.environ.get("CACHE_TYPE") or "memory"
+    CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL")
+    CACHE_DEFAULT_TIMEOUT = 30
+    CACHE_MAX_ENTRIES = 500
+    IDENTITY_CACHE_SIZE = 1000
+    IDENTITY_CACHE_TIMEOUT = 60
+    INSTRUMENTATION_ENABLED = (
+        os.environ.get("INSTRUMENTATION_ENABLED") is not None
+    )
+    # seconds
+    SLOW_QUERY_THRESHOLD = float(os.environ.get("SLOW_QUERY_THRESHOLD") or 0.1)
+    # auto (FTS5 on SQLite, inverted index elsewhere), fts5 or terms
+    SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND") or "auto"
+    SEARCH_RESULTS = 30
+    API_PAGE_SIZE = 30
+    API_MAX_PAGE_SIZE = 100
+    API_CACHE_MAX_AGE = 10
+    API_COMPRESS_MIN_SIZE = 1024
+    # uncompressed bytes; bigger responses are logged
+    API_RESPONSE_BUDGET = 64 * 1024
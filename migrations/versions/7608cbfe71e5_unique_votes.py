@@ -0,0 +1,118 @@
+"""unique votes
+
+Revision ID: 7608cbfe71e5
+Revises: a5aeac3b57bb
+Create Date: 2026-10-17 22:37:26.804418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7608cbfe71e5'
+down_revision = 'a5aeac3b57bb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # every duplicate was counted when it was cast: take it back out of the
+    # score, the author's karma and, for a top level comment, the score of
+    # its thread
+    connection = op.get_bind()
+    post = sa.table(
+        'post',
+        sa.column('id', sa.Integer),
+        sa.column('user_id', sa.Integer),
+        sa.column('score', sa.Integer),
+    )
+    user = sa.table(
+        'user', sa.column('id', sa.Integer), sa.column('karma', sa.Integer)
+    )
+    comment = sa.table(
+        'comment',
+        sa.column('id', sa.Integer),
+        sa.column('post_id', sa.Integer),
+        sa.column('parent_id', sa.Integer),
+        sa.column('path', sa.String),
+        sa.column('score', sa.Integer),
+        sa.column('thread_score', sa.Integer),
+    )
+    vote = sa.table(
+        'vote',
+        sa.column('user_id', sa.Integer),
+        sa.column('post_id', sa.Integer),
+    )
+    comment_vote = sa.table(
+        'comment__vote',
+        sa.column('user_id', sa.Integer),
+        sa.column('comment_id', sa.Integer),
+    )
+
+    for post_id, extra in excess(connection, vote, vote.c.post_id):
+        connection.execute(
+            post.update()
+            .where(post.c.id == post_id)
+            .values(score=post.c.score - extra)
+        )
+        author_id = sa.select([post.c.user_id]).where(post.c.id == post_id)
+        connection.execute(
+            user.update()
+            .where(user.c.id == author_id.as_scalar())
+            .values(karma=user.c.karma - extra)
+        )
+    for comment_id, extra in excess(
+        connection, comment_vote, comment_vote.c.comment_id
+    ):
+        connection.execute(
+            comment.update()
+            .where(comment.c.id == comment_id)
+            .values(score=comment.c.score - extra)
+        )
+        root = connection.execute(
+            sa.select([comment.c.post_id, comment.c.path])
+            .where(comment.c.id == comment_id)
+            .where(comment.c.parent_id == None)
+        ).first()
+        if root is not None:
+            connection.execute(
+                comment.update()
+                .where(comment.c.post_id == root.post_id)
+                .where(comment.c.path.like(root.path + '%'))
+                .values(thread_score=comment.c.thread_score - extra)
+            )
+
+    # drop racing duplicates before the unique indexes can be built
+    op.execute(
+        'DELETE FROM vote WHERE id NOT IN (SELECT id FROM '
+        '(SELECT MIN(id) AS id FROM vote GROUP BY user_id, post_id) AS keep)'
+    )
+    op.execute(
+        'DELETE FROM comment__vote WHERE id NOT IN (SELECT id FROM '
+        '(SELECT MIN(id) AS id FROM comment__vote '
+        'GROUP BY user_id, comment_id) AS keep)'
+    )
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_index('ix_comment__vote_user_id_comment_id', 'comment__vote', ['user_id', 'comment_id'], unique=True)
+    op.create_index('ix_vote_user_id_post_id', 'vote', ['user_id', 'post_id'], unique=True)
+    # ### end Alembic commands ###
+
+
+def excess(connection, table, target):
+    # (target id, votes beyond the first) for each repeated voter
+    extra = {}
+    for target_id, count in connection.execute(
+        sa.select([target, sa.func.count()])
+        .group_by(table.c.user_id, target)
+        .having(sa.func.count() > 1)
+    ):
+        extra[target_id] = extra.get(target_id, 0) + count - 1
+    return extra.items()
+
+
+def downgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_index('ix_vote_user_id_post_id', table_name='vote')
+    op.drop_index('ix_comment__vote_user_id_comment_id', table_name='comment__vote')
+    # ### end Alembic commands ###
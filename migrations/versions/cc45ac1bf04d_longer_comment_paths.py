@@ -0,0 +1,32 @@
+"""longer comment paths
+
+Revision ID: cc45ac1bf04d
+Revises: 5a410b1e992d
+Create Date: 2026-10-17 23:41:07.385520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cc45ac1bf04d'
+down_revision = '5a410b1e992d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('comment') as batch_op:
+        batch_op.alter_column('path',
+               existing_type=sa.String(length=60),
+               type_=sa.String(length=190),
+               existing_nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('comment') as batch_op:
+        batch_op.alter_column('path',
+               existing_type=sa.String(length=190),
+               type_=sa.String(length=60),
+               existing_nullable=True)